@@ -0,0 +1,104 @@
+import os
+from typing import Callable, Dict, List, NamedTuple
+
+class BenchmarkProgram(NamedTuple):
+    name: str
+    source: str
+    input_lines: List[str]
+
+def counting_loop(scale: float = 1.0) -> BenchmarkProgram:
+    iterations = max(1, int(200000 * scale))
+    source = '\n'.join([
+        'LET i 0',
+        'LET s 0',
+        'loop: ADD s i',
+        'ADD i 1',
+        f'GOTO "loop" IF i < {iterations}',
+        'PRINT s',
+        '.'
+    ])
+    return BenchmarkProgram('counting_loop', source, [])
+
+def gosub_recursion(scale: float = 1.0) -> BenchmarkProgram:
+    depth = max(1, int(5000 * scale))
+    source = '\n'.join([
+        'LET rounds 0',
+        'again: LET n 0',
+        'GOSUB "down"',
+        'ADD rounds 1',
+        'GOTO "again" IF rounds < 20',
+        'PRINT n',
+        'END',
+        'down: ADD n 1',
+        f'GOSUB "down" IF n < {depth}',
+        'RETURN',
+        '.'
+    ])
+    return BenchmarkProgram('gosub_recursion', source, [])
+
+def string_concatenation(scale: float = 1.0) -> BenchmarkProgram:
+    iterations = max(1, int(20000 * scale))
+    source = '\n'.join([
+        'LET i 0',
+        'LET s "report"',
+        'loop: ADD s ", entry"',
+        'ADD i 1',
+        f'GOTO "loop" IF i < {iterations}',
+        'LET dash "-"',
+        'MULT dash 40',
+        'PRINT dash',
+        'PRINT i',
+        '.'
+    ])
+    return BenchmarkProgram('string_concatenation', source, [])
+
+def io_heavy(scale: float = 1.0) -> BenchmarkProgram:
+    count = max(1, int(50000 * scale))
+    source = '\n'.join([
+        'LET i 0',
+        'LET total 0',
+        'loop: INNUM x',
+        'ADD total x',
+        'PRINT x',
+        'PRINT "running total"',
+        'PRINT total',
+        'ADD i 1',
+        f'GOTO "loop" IF i < {count}',
+        '.'
+    ])
+    return BenchmarkProgram('io_heavy', source, [str(value % 997) for value in range(count)])
+
+def large_source(scale: float = 1.0) -> BenchmarkProgram:
+    blocks = max(1, int(20000 * scale))
+    lines = []
+    for block in range(blocks):
+        var_name = f'v{block % 200}'
+        lines.extend([
+            f'B{block}: LET {var_name} {block}',
+            f'ADD {var_name} 3',
+            f'MULT {var_name} 2',
+            f'GOTO 2 IF {var_name} < 0',
+            f'SUB {var_name} 1'
+        ])
+    lines.extend(['PRINT v0', '.'])
+    return BenchmarkProgram('large_source', '\n'.join(lines), [])
+
+GENERATORS: Dict[str, Callable[[float], BenchmarkProgram]] = {
+    'counting_loop': counting_loop,
+    'gosub_recursion': gosub_recursion,
+    'string_concatenation': string_concatenation,
+    'io_heavy': io_heavy,
+    'large_source': large_source
+}
+
+def generate_corpus(scale: float = 1.0, names: List[str] = None) -> List[BenchmarkProgram]:
+    return [GENERATORS[name](scale) for name in (names or GENERATORS)]
+
+def write_corpus(programs: List[BenchmarkProgram], directory: str):
+    os.makedirs(directory, exist_ok=True)
+    for program in programs:
+        with open(os.path.join(directory, program.name + '.smile'), 'w') as program_file:
+            program_file.write(program.source + '\n')
+        if program.input_lines:
+            with open(os.path.join(directory, program.name + '.in'), 'w') as input_file:
+                input_file.write('\n'.join(program.input_lines) + '\n')
@@ -0,0 +1,77 @@
+import argparse
+import gc
+import random
+import time
+from typing import Callable, List
+from smile.lexer import Tokenizer, RegexTokenizer
+
+LEXER_BACKENDS = {
+    'classic': Tokenizer,
+    'regex': RegexTokenizer
+}
+
+_LINE_TEMPLATES = [
+    'LET {var} {number}',
+    'LET {var} "{text}"',
+    'ADD {var} {var}',
+    'SUB {var} {number}',
+    'MULT {var} {float}',
+    'DIV {var} {number}',
+    'PRINT {var}',
+    'PRINT "{text}"',
+    'INNUM {var}',
+    'GOTO {number} IF {var} < {number}',
+    'GOSUB "{label}" IF {var} >= {float}',
+    '{label}: PRINT {var}',
+    'RETURN'
+]
+
+def generate_lines(line_count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(line_count):
+        template = rng.choice(_LINE_TEMPLATES)
+        lines.append(template.format(
+            var=f'v{rng.randrange(50)}',
+            number=rng.randrange(-1000, 1000),
+            float=f'{rng.uniform(0, 100):.3f}',
+            text=' '.join(rng.choice(['alpha', 'beta', 'gamma', 'delta']) for _ in range(rng.randint(1, 4))),
+            label=f'L{rng.randrange(100)}'
+        ))
+    return lines
+
+def measure(tokenize_line: Callable, lines: List[str], repeat: int) -> dict:
+    best = None
+    token_count = 0
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        started = time.perf_counter()
+        token_count = 0
+        for line_number, line in enumerate(lines, 1):
+            token_count += len(tokenize_line(line, line_number))
+        elapsed = time.perf_counter() - started
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return {'seconds': best, 'tokens': token_count, 'tokens_per_second': token_count / best, 'lines_per_second': len(lines) / best}
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Compare lexer backends on a generated Smile program.')
+    arg_parser.add_argument('--lines', type=int, default=50000, help='number of generated source lines')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs per backend; the fastest is reported')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    options = arg_parser.parse_args(argv)
+    lines = generate_lines(options.lines, options.seed)
+    results = {}
+    for name, backend in LEXER_BACKENDS.items():
+        results[name] = measure(backend.tokenize_line, lines, options.repeat)
+        print(f"{name:>8}: {results[name]['tokens_per_second']:>12,.0f} tokens/s "
+              f"{results[name]['lines_per_second']:>10,.0f} lines/s ({results[name]['seconds']:.3f}s)")
+    baseline = results['classic']['seconds']
+    for name, result in results.items():
+        if name != 'classic':
+            print(f'{name} speedup over classic: {baseline / result["seconds"]:.2f}x')
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+from smile.compiler import Compiler, Linker
+from smile.exceptions import SmileRuntimeException
+from smile.interpreter import Interpreter
+from smile.lexer import RegexTokenizer
+from smile.loader import split_program_lines
+from smile.optimizer import optimize_program
+from smile.parser import Parser
+from smile.profiler import Profiler
+from smile.streams import BufferedInput, MemorySink
+from .corpus import GENERATORS, BenchmarkProgram, generate_corpus, write_corpus
+
+PHASES = ('load', 'lex', 'parse', 'compile', 'run')
+DEFAULT_THRESHOLD = 0.10
+MIN_COMPARED_SECONDS = 0.001
+
+def best_time(action: Callable[[], Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        started = time.perf_counter()
+        try:
+            action()
+        finally:
+            elapsed = time.perf_counter() - started
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _lex_lines(source_lines: List[str]) -> int:
+    token_count = 0
+    for line_number, line in enumerate(source_lines, 1):
+        token_count += len(RegexTokenizer.tokenize_line(line, line_number))
+    return token_count
+
+def _compile(token_lines, label_registry: Dict[str, int], optimize: bool):
+    program = Linker.link_program(Compiler.compile_program(token_lines), label_registry)
+    if optimize:
+        optimize_program(program)
+    return program
+
+def _run(program, input_lines: List[str], profiler: Optional[Profiler] = None):
+    try:
+        Interpreter(program, BufferedInput(input_lines), MemorySink()).run(profiler)
+    except SmileRuntimeException as runtime_error:
+        return str(runtime_error)
+    return None
+
+def measure_program(program: BenchmarkProgram, repeat: int, optimize: bool = False) -> Dict[str, Any]:
+    raw_lines = program.source.splitlines()
+    source_lines, label_registry = split_program_lines(raw_lines)
+    token_lines = list(Parser.parse_source(source_lines))
+    compiled_program = _compile(token_lines, label_registry, optimize)
+    profiler = Profiler(compiled_program)
+    error = _run(compiled_program, program.input_lines, profiler)
+    instruction_count = sum(profiler.instruction_counts)
+    seconds = {
+        'load': best_time(lambda: split_program_lines(raw_lines), repeat),
+        'lex': best_time(lambda: _lex_lines(source_lines), repeat),
+        'parse': best_time(lambda: list(Parser.parse_source(source_lines)), repeat),
+        'compile': best_time(lambda: _compile(token_lines, label_registry, optimize), repeat),
+        'run': best_time(lambda: _run(compiled_program, program.input_lines), repeat)
+    }
+    phases = {}
+    for phase, elapsed in seconds.items():
+        if phase == 'run':
+            phases[phase] = {'seconds': elapsed, 'instructions_per_second': instruction_count / elapsed if elapsed else None}
+        else:
+            phases[phase] = {'seconds': elapsed, 'lines_per_second': len(source_lines) / elapsed if elapsed else None}
+    return {
+        'lines': len(source_lines),
+        'tokens': _lex_lines(source_lines),
+        'instructions': instruction_count,
+        'error': error,
+        'phases': phases
+    }
+
+def run_suite(programs: List[BenchmarkProgram], repeat: int, optimize: bool = False) -> Dict[str, Any]:
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'optimize': optimize,
+            'repeat': repeat
+        },
+        'benchmarks': {program.name: measure_program(program, repeat, optimize) for program in programs}
+    }
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    regressions = []
+    for name, benchmark in results['benchmarks'].items():
+        baseline_benchmark = baseline.get('benchmarks', {}).get(name)
+        if baseline_benchmark is None:
+            continue
+        for phase, measurement in benchmark['phases'].items():
+            baseline_seconds = baseline_benchmark['phases'].get(phase, {}).get('seconds')
+            if not baseline_seconds or baseline_seconds < MIN_COMPARED_SECONDS:
+                continue
+            ratio = measurement['seconds'] / baseline_seconds
+            if ratio > 1 + threshold:
+                regressions.append(f'{name}/{phase}: {measurement["seconds"]:.4f}s vs {baseline_seconds:.4f}s baseline ({(ratio - 1) * 100:+.1f}%)')
+    return regressions
+
+def format_results(results: Dict[str, Any]) -> str:
+    lines = [f'{"Benchmark":<22} {"Phase":<8} {"Seconds":>10} {"Throughput":>16}']
+    for name, benchmark in results['benchmarks'].items():
+        for phase, measurement in benchmark['phases'].items():
+            if phase == 'run':
+                rate, unit = measurement['instructions_per_second'], 'instr/s'
+            else:
+                rate, unit = measurement['lines_per_second'], 'lines/s'
+            throughput = f'{rate:,.0f} {unit}' if rate else '-'
+            lines.append(f'{name:<22} {phase:<8} {measurement["seconds"]:>10.4f} {throughput:>16}')
+        if benchmark['error']:
+            lines.append(f'{name:<22} error: {benchmark["error"]}')
+    return '\n'.join(lines)
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Time the lexer, parser, compiler and runtime on a generated Smile corpus.')
+    arg_parser.add_argument('--benchmark', action='append', choices=sorted(GENERATORS), dest='benchmarks',
+                            help='run only this benchmark (may be repeated)')
+    arg_parser.add_argument('--scale', type=float, default=1.0, help='multiply every generated program size by this factor')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs per phase; the fastest is reported')
+    arg_parser.add_argument('--optimize', action='store_true', help='run the peephole optimizer as part of the compile phase')
+    arg_parser.add_argument('--output', metavar='PATH', help='write the results as JSON')
+    arg_parser.add_argument('--baseline', metavar='PATH', help='compare against results saved by an earlier --output')
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='fail when a phase is slower than the baseline by more than this fraction')
+    arg_parser.add_argument('--write-corpus', metavar='DIR', help='save the generated programs for use with --batch and exit')
+    options = arg_parser.parse_args(argv)
+    programs = generate_corpus(options.scale, options.benchmarks)
+    if options.write_corpus:
+        write_corpus(programs, options.write_corpus)
+        return 0
+    results = run_suite(programs, options.repeat, options.optimize)
+    print(format_results(results))
+    if options.output:
+        with open(options.output, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+            results_file.write('\n')
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), options.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'No phase regressed by more than {options.threshold * 100:.0f}%', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
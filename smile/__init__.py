@@ -1,6 +1,26 @@
 from .tokens import *
 from .exceptions import *
+from .ropes import *
 from .state import *
 from .lexer import *
 from .parser import *
-from .runtime import * 
\ No newline at end of file
+from .runtime import *
+from .opcodes import *
+from .compiler import *
+from .streams import *
+from .profiler import *
+from .hooks import *
+from .limits import *
+from .interpreter import *
+from .aio import *
+from .loader import *
+from .optimizer import *
+from .memoize import *
+from .parallel import *
+from .transpiler import *
+from .cache import *
+from .batch import *
+from .lockstep import *
+from .daemon import *
+from .incremental import *
+from .snapshot import *
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Any, Dict, Iterable, List
+from .compiler import CompiledProgram
+from .exceptions import SmileRuntimeException
+from .opcodes import Opcode
+from .state import ProgramState
+
+DEFAULT_YIELD_INTERVAL = 1000
+
+class AsyncInputProvider:
+    async def read_line(self) -> str:
+        raise NotImplementedError
+    def position(self) -> int:
+        raise NotImplementedError
+
+class AsyncQueueInput(AsyncInputProvider):
+    def __init__(self, lines: Iterable[str] = ()):
+        self._queue = asyncio.Queue()
+        self._consumed = 0
+        for line in lines:
+            self._queue.put_nowait(line)
+    def feed(self, line: str):
+        self._queue.put_nowait(line)
+    def close(self):
+        self._queue.put_nowait(None)
+    async def read_line(self) -> str:
+        line = await self._queue.get()
+        if line is None:
+            self._queue.put_nowait(None)
+            raise EOFError('EOF when reading a line')
+        self._consumed += 1
+        return line
+    def position(self) -> int:
+        return self._consumed
+
+class AsyncStreamInput(AsyncInputProvider):
+    def __init__(self, reader: asyncio.StreamReader, encoding: str = 'utf-8'):
+        self._reader = reader
+        self._encoding = encoding
+        self._consumed = 0
+    async def read_line(self) -> str:
+        data = await self._reader.readline()
+        if not data:
+            raise EOFError('EOF when reading a line')
+        self._consumed += 1
+        return data.decode(self._encoding).rstrip('\r\n')
+    def position(self) -> int:
+        return self._consumed
+
+class AsyncOutputSink:
+    async def write_line(self, value: Any):
+        raise NotImplementedError
+    async def flush(self):
+        pass
+
+class AsyncStreamSink(AsyncOutputSink):
+    def __init__(self, writer: asyncio.StreamWriter, encoding: str = 'utf-8'):
+        self._writer = writer
+        self._encoding = encoding
+    async def write_line(self, value: Any):
+        self._writer.write(f'{value}\n'.encode(self._encoding))
+    async def flush(self):
+        await self._writer.drain()
+
+class AsyncMemorySink(AsyncOutputSink):
+    def __init__(self):
+        self._chunks = []
+    async def write_line(self, value: Any):
+        self._chunks.append(f'{value}\n')
+    def getvalue(self) -> str:
+        return ''.join(self._chunks)
+    def lines(self) -> List[str]:
+        return [chunk[:-1] for chunk in self._chunks]
+
+class AsyncInterpreter:
+    _INPUT_OPCODES = frozenset([Opcode.INNUM, Opcode.INSTR])
+
+    def __init__(self, program: CompiledProgram, input_source: AsyncInputProvider, output: AsyncOutputSink, yield_every: int = DEFAULT_YIELD_INTERVAL):
+        self.program = program
+        self.input_source = input_source
+        self.output = output
+        self.yield_every = max(1, yield_every)
+        self.state = ProgramState(program, input_source, output)
+        self._pending_output = []
+        self._next_line = None
+        self.state.read_line = self._take_line
+        self.state.write_line = self._pending_output.append
+        self._reads_input = [any(step.opcode in self._INPUT_OPCODES for step in self._steps(instruction)) for instruction in program.instructions]
+
+    async def run(self) -> int:
+        state = self.state
+        try:
+            await self._execute(state)
+        except SmileRuntimeException as runtime_error:
+            if runtime_error.location() is None:
+                raise SmileRuntimeException(runtime_error.message(), state.instructions[state.instruction_pointer].position) from None
+            raise
+        finally:
+            await self._drain()
+            await self.output.flush()
+        return 0
+
+    async def _execute(self, state: ProgramState):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        reads_input = self._reads_input
+        pending_output = self._pending_output
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                budget = self.yield_every
+                while budget and instruction_pointer < instruction_count:
+                    instruction = instructions[instruction_pointer]
+                    if reads_input[instruction_pointer]:
+                        instruction_pointer = await self._execute_with_input(state, instruction, instruction_pointer)
+                    else:
+                        instruction_pointer = instruction.handler(state, instruction, instruction_pointer)
+                    if pending_output:
+                        await self._drain()
+                    budget -= 1
+                await asyncio.sleep(0)
+        finally:
+            state.instruction_pointer = instruction_pointer
+    async def _execute_with_input(self, state: ProgramState, instruction, instruction_pointer: int) -> int:
+        next_pointer = instruction_pointer + 1
+        for step in self._steps(instruction):
+            if step.opcode in self._INPUT_OPCODES:
+                await self._drain()
+                self._next_line = await self.input_source.read_line()
+            next_pointer = step.handler(state, step, instruction_pointer)
+        return next_pointer
+    async def _drain(self):
+        pending_output = self._pending_output
+        while pending_output:
+            values = pending_output[:]
+            pending_output.clear()
+            for value in values:
+                await self.output.write_line(value)
+    def _take_line(self) -> str:
+        line, self._next_line = self._next_line, None
+        return line
+    def _steps(self, instruction):
+        if instruction.opcode == Opcode.SEQUENCE:
+            return instruction.operands
+        return (instruction,)
+
+    def variables(self) -> Dict[str, Any]:
+        return self.state.variables()
+
+async def run_program_async(program: CompiledProgram, input_source: AsyncInputProvider, output: AsyncOutputSink,
+                            yield_every: int = DEFAULT_YIELD_INTERVAL) -> int:
+    return await AsyncInterpreter(program, input_source, output, yield_every).run()
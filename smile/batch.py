@@ -0,0 +1,108 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+from .compiler import compile_source
+from .exceptions import SmileParseException, SmileLinkException, SmileRuntimeException
+from .interpreter import Interpreter
+from .loader import load_program_file
+from .streams import BufferedInput, MemorySink
+
+PROGRAM_SUFFIX = '.smile'
+INPUT_SUFFIX = '.in'
+
+class BatchJob(NamedTuple):
+    name: str
+    program_path: str
+    input_path: Optional[str]
+
+def discover_jobs(source: str) -> List[BatchJob]:
+    if os.path.isdir(source):
+        return _discover_directory(source)
+    return _read_manifest(source)
+
+def _discover_directory(directory: str) -> List[BatchJob]:
+    jobs = []
+    for entry in sorted(os.listdir(directory)):
+        if not entry.endswith(PROGRAM_SUFFIX):
+            continue
+        name = entry[:-len(PROGRAM_SUFFIX)]
+        input_path = os.path.join(directory, name + INPUT_SUFFIX)
+        jobs.append(BatchJob(name, os.path.join(directory, entry), input_path if os.path.exists(input_path) else None))
+    return jobs
+
+def _read_manifest(manifest_path: str) -> List[BatchJob]:
+    base_directory = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path) as manifest_file:
+        entries = json.load(manifest_file)
+    jobs = []
+    for entry in entries:
+        program_path = os.path.join(base_directory, entry['program'])
+        input_path = entry.get('input')
+        if input_path is not None:
+            input_path = os.path.join(base_directory, input_path)
+        jobs.append(BatchJob(entry.get('name', os.path.basename(program_path)), program_path, input_path))
+    return jobs
+
+def run_job(job: BatchJob) -> Dict[str, Any]:
+    started = time.perf_counter()
+    captured = MemorySink()
+    exit_status = 0
+    error = None
+    compile_seconds = run_seconds = 0.0
+    try:
+        source_lines, label_registry = load_program_file(job.program_path)
+        if job.input_path is not None:
+            input_source = BufferedInput.from_file(job.input_path)
+        else:
+            input_source = BufferedInput([])
+        try:
+            program = compile_source(source_lines, label_registry)
+        except (SmileParseException, SmileLinkException) as load_error:
+            captured.write_line(load_error)
+        else:
+            compile_seconds = time.perf_counter() - started
+            interpreter = Interpreter(program, input_source, captured)
+            try:
+                interpreter.run()
+            except SmileRuntimeException as runtime_error:
+                captured.write_line(runtime_error)
+                exit_status = 1
+            run_seconds = time.perf_counter() - started - compile_seconds
+    except Exception as unexpected_error:
+        exit_status = 1
+        error = f'{type(unexpected_error).__name__}: {unexpected_error}'
+    return {
+        'name': job.name,
+        'program': job.program_path,
+        'input': job.input_path,
+        'exit_status': exit_status,
+        'stdout': captured.getvalue(),
+        'error': error,
+        'compile_seconds': compile_seconds,
+        'run_seconds': run_seconds,
+        'wall_seconds': time.perf_counter() - started
+    }
+
+def run_batch(jobs: List[BatchJob], workers: Optional[int] = None) -> Dict[str, Any]:
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers == 1:
+        results = [run_job(job) for job in jobs]
+    else:
+        chunk_size = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_job, jobs, chunksize=chunk_size))
+    return {
+        'workers': workers,
+        'programs': len(results),
+        'failed': sum(1 for result in results if result['exit_status'] != 0),
+        'wall_seconds': time.perf_counter() - started,
+        'results': results
+    }
+
+def write_results(summary: Dict[str, Any], results_path: str):
+    with open(results_path, 'w') as results_file:
+        json.dump(summary, results_file, indent=2)
+        results_file.write('\n')
@@ -0,0 +1,169 @@
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+from types import CodeType
+from typing import Callable, Dict, List, Optional, Tuple
+from .compiler import CompiledProgram, Instruction, compile_source
+from .optimizer import OptimizationReport, optimize_program
+from .parallel import compile_source_parallel
+from .opcodes import Opcode, COMPOUND_OPCODES
+from .tokens import CodePosition
+from .transpiler import TRANSPILER_VERSION, compile_transpiled
+
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+_ENTRY_SUFFIX = '.smc'
+_CODE_SUFFIX = '.smx'
+
+def _encode_instruction(instruction: Instruction) -> Tuple:
+    operands = instruction.operands
+    if instruction.opcode in COMPOUND_OPCODES:
+        operands = tuple(_encode_instruction(step) for step in operands)
+    return (int(instruction.opcode), operands, instruction.position.pack())
+
+def _decode_instruction(encoded: Tuple) -> Instruction:
+    opcode, operands, packed_position = encoded
+    opcode = Opcode(opcode)
+    if opcode in COMPOUND_OPCODES:
+        operands = tuple(_decode_instruction(step) for step in operands)
+    return Instruction(opcode, operands, CodePosition.unpack(packed_position))
+
+def _encode_report(report: Optional[OptimizationReport]) -> Optional[Tuple]:
+    if report is None:
+        return None
+    entries = tuple((rewrite, position.pack()) for rewrite, position in report.entries)
+    return (report.instructions_before, report.instructions_after, entries)
+
+def _decode_report(encoded: Optional[Tuple]) -> Optional[OptimizationReport]:
+    if encoded is None:
+        return None
+    instructions_before, instructions_after, entries = encoded
+    report = OptimizationReport(instructions_before)
+    report.instructions_after = instructions_after
+    for rewrite, packed_position in entries:
+        report.record(rewrite, CodePosition.unpack(packed_position))
+    return report
+
+def serialize_program(program: CompiledProgram) -> bytes:
+    return marshal.dumps((
+        CACHE_FORMAT_VERSION,
+        tuple(program.variable_names),
+        tuple(program.label_registry.items()),
+        tuple(_encode_instruction(instruction) for instruction in program.instructions),
+        _encode_report(program.optimization_report)
+    ))
+
+def deserialize_program(data) -> CompiledProgram:
+    version, variable_names, labels, instructions, report = marshal.loads(data)
+    if version != CACHE_FORMAT_VERSION:
+        raise ValueError(f'Unsupported compiled program format {version}')
+    program = CompiledProgram([_decode_instruction(encoded) for encoded in instructions], list(variable_names), dict(labels))
+    program.optimization_report = _decode_report(report)
+    return program
+
+def program_key(source_lines: List[str], label_registry: Dict[str, int], optimize: bool = False) -> str:
+    digest = hashlib.sha256()
+    digest.update(f'smile-{CACHE_FORMAT_VERSION}-{sys.implementation.cache_tag}-{"optimized" if optimize else "plain"}\0'.encode())
+    for line in source_lines:
+        digest.update(line.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\n')
+    for label, line_number in sorted(label_registry.items()):
+        digest.update(f'\0{label}\0{line_number}'.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+def code_key(program: CompiledProgram) -> str:
+    digest = hashlib.sha256()
+    digest.update(f'smile-transpiled-{TRANSPILER_VERSION}-{sys.implementation.cache_tag}\0'.encode())
+    digest.update(serialize_program(program))
+    return digest.hexdigest()
+
+class ProgramCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def compile(self, source_lines: List[str], label_registry: Dict[str, int], optimize: bool = False,
+                load_workers: Optional[int] = None) -> CompiledProgram:
+        key = program_key(source_lines, label_registry, optimize)
+        program = self.load(key)
+        if program is not None:
+            self.hits += 1
+            return program
+        self.misses += 1
+        if load_workers is None:
+            program = compile_source(source_lines, label_registry)
+        else:
+            program = compile_source_parallel(source_lines, label_registry, load_workers)
+        if optimize:
+            optimize_program(program)
+        self.store(key, program)
+        return program
+    def transpile(self, program: CompiledProgram) -> CodeType:
+        key = code_key(program)
+        code = self._load_entry(key, _CODE_SUFFIX, marshal.loads)
+        if isinstance(code, CodeType):
+            self.hits += 1
+            return code
+        self.misses += 1
+        code = compile_transpiled(program)
+        self._store_entry(key, _CODE_SUFFIX, marshal.dumps(code))
+        return code
+    def load(self, key: str) -> Optional[CompiledProgram]:
+        return self._load_entry(key, _ENTRY_SUFFIX, deserialize_program)
+    def store(self, key: str, program: CompiledProgram):
+        self._store_entry(key, _ENTRY_SUFFIX, serialize_program(program))
+    def _load_entry(self, key: str, suffix: str, decode: Callable):
+        entry_path = self._entry_path(key, suffix)
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                with mmap.mmap(entry_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    entry = decode(mapped)
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry
+    def _store_entry(self, key: str, suffix: str, data: bytes):
+        descriptor, temporary_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as temporary_file:
+                temporary_file.write(data)
+            os.replace(temporary_path, self._entry_path(key, suffix))
+        except OSError:
+            try:
+                os.unlink(temporary_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((_ENTRY_SUFFIX, _CODE_SUFFIX)):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_bytes += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_bytes -= size
+    def _entry_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
@@ -0,0 +1,213 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .tokens import SmileToken, SmileTokenType, CodePosition
+from .exceptions import SmileLinkException
+from .opcodes import Opcode, CONTROL_OPCODES, ARITHMETIC_OPCODES
+from .parser import process_source
+from .runtime import VariableManager, OutputManager, InputProcessor, ArithmeticEngine, FlowController, FusedOperations
+
+_HANDLERS = {
+    Opcode.NOP: FlowController.skip_instruction,
+    Opcode.LET: VariableManager.assign_value,
+    Opcode.PRINT: OutputManager.display_content,
+    Opcode.END: FlowController.execute_termination,
+    Opcode.INNUM: InputProcessor.handle_numeric_input,
+    Opcode.INSTR: InputProcessor.handle_text_input,
+    Opcode.ADD: ArithmeticEngine.perform_operation,
+    Opcode.SUB: ArithmeticEngine.perform_operation,
+    Opcode.MULT: ArithmeticEngine.perform_operation,
+    Opcode.DIV: ArithmeticEngine.perform_operation,
+    Opcode.GOTO: FlowController.execute_jump,
+    Opcode.GOSUB: FlowController.execute_subroutine_call,
+    Opcode.RETURN: FlowController.execute_subroutine_return,
+    Opcode.FAIL: FlowController.report_failure,
+    Opcode.SEQUENCE: FlowController.execute_sequence,
+    Opcode.ARITHMETIC_JUMP: FusedOperations.execute_arithmetic_jump,
+    Opcode.ASSIGN_ARITHMETIC: FusedOperations.execute_assign_arithmetic,
+    Opcode.TAIL_CALL: FlowController.execute_tail_call
+}
+
+class Instruction:
+    __slots__ = ('opcode', 'operands', 'position', 'handler', 'cache')
+
+    def __init__(self, opcode: Opcode, operands: Tuple, position: CodePosition):
+        self.opcode = opcode
+        self.operands = operands
+        self.position = position
+        self.handler = _HANDLERS[opcode]
+        self.cache = ArithmeticEngine.UNSPECIALIZED
+    def __repr__(self) -> str:
+        return f'Instruction({self.opcode.name}, {self.operands!r}, {self.position!r})'
+
+class CompiledProgram:
+    def __init__(self, instructions: List[Instruction], variable_names: List[str], label_registry: Optional[Dict[str, int]] = None):
+        self.instructions = instructions
+        self.variable_names = variable_names
+        self.label_registry = label_registry or {}
+        self.optimization_report = None
+    def slot_of(self, var_name: str) -> Optional[int]:
+        try:
+            return self.variable_names.index(var_name)
+        except ValueError:
+            return None
+
+class Compiler:
+    _STATEMENT_OPCODES = {
+        SmileTokenType.ASSIGN: Opcode.LET,
+        SmileTokenType.OUTPUT: Opcode.PRINT,
+        SmileTokenType.TERMINATE: Opcode.END,
+        SmileTokenType.NUMERIC_INPUT: Opcode.INNUM,
+        SmileTokenType.TEXT_INPUT: Opcode.INSTR,
+        SmileTokenType.ADDITION: Opcode.ADD,
+        SmileTokenType.SUBTRACTION: Opcode.SUB,
+        SmileTokenType.MULTIPLICATION: Opcode.MULT,
+        SmileTokenType.DIVISION: Opcode.DIV,
+        SmileTokenType.JUMP: Opcode.GOTO,
+        SmileTokenType.SUBROUTINE_CALL: Opcode.GOSUB,
+        SmileTokenType.SUBROUTINE_RETURN: Opcode.RETURN
+    }
+    _NUMERIC_KINDS = frozenset([SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA])
+    _LITERAL_KINDS = frozenset([SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA, SmileTokenType.STRING_DATA])
+    _TARGET_KINDS = frozenset([SmileTokenType.INTEGER_DATA, SmileTokenType.STRING_DATA])
+
+    @classmethod
+    def compile_program(cls, token_lines: Iterable[List[SmileToken]]) -> CompiledProgram:
+        slots = {}
+        instructions = [cls.compile_line(tokens, slots) for tokens in token_lines]
+        return CompiledProgram(instructions, list(slots))
+    @classmethod
+    def compile_line(cls, tokens: List[SmileToken], slots: Dict[str, int]) -> Instruction:
+        steps = []
+        for token in tokens:
+            opcode = cls._STATEMENT_OPCODES.get(token.kind())
+            if opcode is None:
+                continue
+            step = cls._lower_statement(opcode, tokens, token.location(), slots)
+            steps.append(step)
+            if step.opcode in CONTROL_OPCODES:
+                break
+        if not steps:
+            return Instruction(Opcode.NOP, (), tokens[0].location())
+        if len(steps) == 1:
+            return steps[0]
+        return Instruction(Opcode.SEQUENCE, tuple(steps), steps[0].position)
+    @classmethod
+    def _lower_statement(cls, opcode: Opcode, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        if opcode == Opcode.LET:
+            return cls._lower_assignment(tokens, position, slots)
+        elif opcode == Opcode.PRINT:
+            return cls._lower_output(tokens, position, slots)
+        elif opcode in (Opcode.INNUM, Opcode.INSTR):
+            return cls._lower_input(opcode, tokens, position, slots)
+        elif opcode in ARITHMETIC_OPCODES:
+            return cls._lower_arithmetic(opcode, tokens, position, slots)
+        elif opcode in (Opcode.GOTO, Opcode.GOSUB):
+            return cls._lower_jump(opcode, tokens, position, slots)
+        return Instruction(opcode, (), position)
+    @classmethod
+    def _allocate_slot(cls, slots: Dict[str, int], var_name: str) -> int:
+        return slots.setdefault(var_name, len(slots))
+    @classmethod
+    def _lower_assignment(cls, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        var_name = None
+        var_value = None
+        for token in tokens:
+            if token.kind() == SmileTokenType.VARIABLE_NAME:
+                var_name = token.text()
+            elif token.kind() in cls._LITERAL_KINDS:
+                var_value = token.value()
+        if var_name and var_value is not None:
+            return Instruction(Opcode.LET, (cls._allocate_slot(slots, var_name), var_value), position)
+        return Instruction(Opcode.NOP, (), position)
+    @classmethod
+    def _lower_output(cls, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        items = []
+        for token in tokens:
+            if token.kind() == SmileTokenType.VARIABLE_NAME:
+                items.append((cls._allocate_slot(slots, token.text()), None))
+            elif token.kind() == SmileTokenType.STRING_DATA:
+                items.append((None, token.value()))
+        return Instruction(Opcode.PRINT, tuple(items), position)
+    @classmethod
+    def _lower_input(cls, opcode: Opcode, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        for token in tokens:
+            if token.kind() == SmileTokenType.VARIABLE_NAME:
+                return Instruction(opcode, (cls._allocate_slot(slots, token.text()),), position)
+        return Instruction(Opcode.NOP, (), position)
+    @classmethod
+    def _lower_arithmetic(cls, opcode: Opcode, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        if len(tokens) < 3:
+            return Instruction(Opcode.FAIL, ('Invalid operation format',), position)
+        if tokens[1].kind() != SmileTokenType.VARIABLE_NAME:
+            return Instruction(Opcode.NOP, (), position)
+        operand = tokens[2]
+        if operand.kind() in cls._LITERAL_KINDS:
+            target_slot = cls._allocate_slot(slots, tokens[1].text())
+            return Instruction(opcode, (target_slot, None, operand.value()), position)
+        elif operand.kind() == SmileTokenType.VARIABLE_NAME:
+            target_slot = cls._allocate_slot(slots, tokens[1].text())
+            return Instruction(opcode, (target_slot, cls._allocate_slot(slots, operand.text()), None), position)
+        return Instruction(Opcode.NOP, (), position)
+    @classmethod
+    def _lower_jump(cls, opcode: Opcode, tokens: List[SmileToken], position: CodePosition, slots: Dict[str, int]) -> Instruction:
+        if len(tokens) == 2:
+            condition = None
+        elif len(tokens) == 6:
+            left_slot, left_literal = cls._lower_operand(tokens[3], slots)
+            right_slot, right_literal = cls._lower_operand(tokens[5], slots)
+            condition = (left_slot, left_literal, tokens[4].text(), right_slot, right_literal)
+        elif opcode == Opcode.GOTO:
+            return Instruction(Opcode.FAIL, ('Invalid jump format',), position)
+        else:
+            return Instruction(Opcode.FAIL, ('Invalid subroutine call format',), position)
+        target = tokens[1].text() if tokens[1].kind() in cls._TARGET_KINDS else None
+        return Instruction(opcode, (target, condition), position)
+    @classmethod
+    def _lower_operand(cls, token: SmileToken, slots: Dict[str, int]) -> Tuple[Optional[int], Any]:
+        if token.kind() == SmileTokenType.VARIABLE_NAME:
+            return (cls._allocate_slot(slots, token.text()), None)
+        elif token.kind() in cls._NUMERIC_KINDS:
+            return (None, token.value())
+        return (None, None)
+
+class Linker:
+    _JUMP_OPCODES = frozenset([Opcode.GOTO, Opcode.GOSUB])
+
+    @classmethod
+    def link_program(cls, program: CompiledProgram, label_registry: Dict[str, int]) -> CompiledProgram:
+        instructions = program.instructions
+        for index, instruction in enumerate(instructions):
+            cls._link_instruction(instruction, index, len(instructions), label_registry)
+        program.label_registry = dict(label_registry)
+        return program
+    @classmethod
+    def _link_instruction(cls, instruction: Instruction, index: int, instruction_count: int, label_registry: Dict[str, int]):
+        if instruction.opcode == Opcode.SEQUENCE:
+            for step in instruction.operands:
+                cls._link_instruction(step, index, instruction_count, label_registry)
+        elif instruction.opcode in cls._JUMP_OPCODES:
+            target, condition = instruction.operands
+            if target is not None:
+                target = cls._resolve_target(target, index, instruction_count, label_registry, instruction.position)
+            instruction.operands = (target, condition)
+    @classmethod
+    def _resolve_target(cls, target: str, index: int, instruction_count: int, label_registry: Dict[str, int], position: CodePosition) -> int:
+        if target.isdigit() or (target.startswith('-') and target[1:].isdigit()):
+            offset = int(target)
+            if offset == 0:
+                raise SmileLinkException('Jump offset of 0 causes infinite loop', position)
+            target_position = index + offset
+            if not 0 <= target_position < instruction_count:
+                raise SmileLinkException(f'Jump target position {target_position} out of range', position)
+            return target_position
+        elif target.startswith('"') and target.endswith('"'):
+            label_name = target[1:-1]
+            if label_name not in label_registry:
+                raise SmileLinkException(f"Label '{label_name}' not found", position)
+            label_position = label_registry[label_name]
+            if not 0 <= label_position - 1 < instruction_count:
+                raise SmileLinkException(f'Label position {label_position} out of range', position)
+            return label_position - 1
+        raise SmileLinkException(f"Invalid jump target '{target}'", position)
+
+def compile_source(source_lines: List[str], label_registry: Dict[str, int]) -> CompiledProgram:
+    return Linker.link_program(Compiler.compile_program(process_source(source_lines)), label_registry)
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import stat
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from .cache import deserialize_program, program_key, serialize_program
+from .compiler import compile_source
+from .exceptions import SmileParseException, SmileLinkException, SmileRuntimeException
+from .interpreter import Interpreter
+from .limits import ExecutionLimits
+from .loader import source_text_lines, split_program_lines
+from .optimizer import optimize_program
+from .streams import BufferedInput, MemorySink
+
+DEFAULT_PROGRAM_ENTRIES = 256
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+_WORKER_PROGRAM_ENTRIES = 64
+_LIMIT_OPTIONS = ('max_instructions', 'max_call_depth', 'max_string_length', 'deadline_seconds')
+_worker_programs = OrderedDict()
+
+def _warm_worker() -> int:
+    return os.getpid()
+
+def _describe(error: Exception) -> str:
+    return traceback.format_exception_only(type(error), error)[-1].rstrip('\n')
+
+def _run_in_worker(program_id: str, source: Optional[str], serialized: Optional[bytes], input_text: str,
+                   optimize: bool, limit_options: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    captured = MemorySink()
+    exit_status = 0
+    error = None
+    compiled = None
+    run_seconds = 0.0
+    program = _worker_programs.get(program_id)
+    try:
+        if program is None and serialized is not None:
+            program = deserialize_program(serialized)
+        elif program is None:
+            source_lines, label_registry = split_program_lines(source_text_lines(source))
+            program = compile_source(source_lines, label_registry)
+            if optimize:
+                optimize_program(program)
+        if serialized is None:
+            compiled = serialize_program(program)
+        _worker_programs[program_id] = program
+        _worker_programs.move_to_end(program_id)
+        if len(_worker_programs) > _WORKER_PROGRAM_ENTRIES:
+            _worker_programs.popitem(last=False)
+        input_source = BufferedInput.from_text(input_text)
+        limits = ExecutionLimits(**limit_options)
+    except (SmileParseException, SmileLinkException) as load_error:
+        captured.write_line(load_error)
+    except Exception as unexpected_error:
+        exit_status = 1
+        error = _describe(unexpected_error)
+    else:
+        compile_seconds = time.perf_counter() - started
+        interpreter = Interpreter(program, input_source, captured)
+        try:
+            interpreter.run(limits=limits if limits.active() else None)
+        except SmileRuntimeException as runtime_error:
+            captured.write_line(runtime_error)
+            exit_status = 1
+        except Exception as unexpected_error:
+            exit_status = 1
+            error = _describe(unexpected_error)
+        run_seconds = time.perf_counter() - started - compile_seconds
+    return {
+        'worker': os.getpid(),
+        'exit_status': exit_status,
+        'stdout': captured.getvalue(),
+        'error': error,
+        'compiled': compiled,
+        'compile_seconds': time.perf_counter() - started - run_seconds,
+        'run_seconds': run_seconds
+    }
+
+def _invalid_field(request: Dict[str, Any], source: Any, program_id: Any, input_text: Any) -> Optional[str]:
+    for field, value in (('source', source), ('program_id', program_id)):
+        if value is not None and not isinstance(value, str):
+            return f'{field} must be a string'
+    if not isinstance(input_text, str):
+        return 'input must be a string'
+    for option in _LIMIT_OPTIONS:
+        value = request.get(option)
+        allowed = (int, float) if option == 'deadline_seconds' else (int,)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, allowed)):
+            return f'{option} must be a number' if option == 'deadline_seconds' else f'{option} must be an integer'
+    return None
+
+class WorkerMetrics:
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.requests = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def record(self, result: Dict[str, Any]):
+        self.requests += 1
+        self.failed += result['exit_status'] != 0
+        self.busy_seconds += result['compile_seconds'] + result['run_seconds']
+    def report(self, uptime_seconds: float) -> Dict[str, Any]:
+        return {
+            'pid': self.pid,
+            'requests': self.requests,
+            'failed': self.failed,
+            'busy_seconds': self.busy_seconds,
+            'requests_per_second': self.requests / uptime_seconds if uptime_seconds else 0.0,
+            'utilization': self.busy_seconds / uptime_seconds if uptime_seconds else 0.0
+        }
+
+class SmileDaemon:
+    def __init__(self, socket_path: str, workers: Optional[int] = None, program_entries: int = DEFAULT_PROGRAM_ENTRIES):
+        self.socket_path = socket_path
+        self.workers = workers or os.cpu_count() or 1
+        self.program_entries = program_entries
+        self.programs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.metrics = {}
+        self._executor = None
+        self._server = None
+        self._started = None
+        self._shutdown = None
+        self._in_flight = set()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self._started = time.monotonic()
+        self._shutdown = asyncio.Event()
+        self._remove_stale_socket()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        for pid in await asyncio.gather(*[loop.run_in_executor(self._executor, _warm_worker) for _ in range(self.workers)]):
+            self.metrics.setdefault(pid, WorkerMetrics(pid))
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.socket_path, limit=MAX_REQUEST_BYTES)
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signal_number, self.request_shutdown)
+        try:
+            await self._shutdown.wait()
+        finally:
+            for signal_number in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(signal_number)
+            self._server.close()
+            if self._in_flight:
+                await asyncio.wait(self._in_flight)
+            self._executor.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+    def _remove_stale_socket(self):
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f'{self.socket_path} exists and is not a socket')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass
+            else:
+                raise FileExistsError(f'A daemon is already listening on {self.socket_path}')
+        os.unlink(self.socket_path)
+    def request_shutdown(self):
+        self._shutdown.set()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while not self._shutdown.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self._respond(line, writer))
+                self._in_flight.add(task)
+                try:
+                    await task
+                finally:
+                    self._in_flight.discard(task)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter):
+        response = await self._dispatch(line)
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+    async def _dispatch(self, line: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                return {'status': 'error', 'error': 'Invalid request: expected a JSON object'}
+            command = request.get('command', 'run')
+            if command == 'run':
+                return await self._run(request)
+            elif command == 'stats':
+                return self.statistics()
+            elif command == 'shutdown':
+                self.request_shutdown()
+                return {'status': 'ok'}
+            return {'status': 'error', 'error': f'Unknown command {command!r}'}
+        except (ValueError, TypeError, KeyError) as request_error:
+            return {'status': 'error', 'error': f'Invalid request: {request_error}'}
+    async def _run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        optimize = bool(request.get('optimize', False))
+        source = request.get('source')
+        program_id = request.get('program_id')
+        input_text = request.get('input', '')
+        invalid = _invalid_field(request, source, program_id, input_text)
+        if invalid is not None:
+            return {'status': 'error', 'error': f'Invalid request: {invalid}'}
+        if source is not None:
+            source_lines, label_registry = split_program_lines(source_text_lines(source))
+            source_id = program_key(source_lines, label_registry, optimize)
+            if program_id is not None and program_id != source_id:
+                return {'status': 'error', 'error': 'program_id does not match the source'}
+            program_id = source_id
+        elif program_id is None:
+            return {'status': 'error', 'error': 'Request needs a source or a program_id'}
+        serialized = self.programs.get(program_id)
+        if serialized is not None:
+            self.programs.move_to_end(program_id)
+            self.hits += 1
+        elif source is None:
+            return {'status': 'error', 'error': f'Unknown program id {program_id}'}
+        else:
+            self.misses += 1
+        limit_options = {option: request[option] for option in _LIMIT_OPTIONS if request.get(option) is not None}
+        result = await asyncio.get_running_loop().run_in_executor(
+            self._executor, _run_in_worker, program_id, None if serialized is not None else source, serialized,
+            input_text, optimize, limit_options)
+        compiled = result.pop('compiled')
+        if compiled is not None:
+            self._remember(program_id, compiled)
+        self.metrics.setdefault(result['worker'], WorkerMetrics(result['worker'])).record(result)
+        result.update({'status': 'ok', 'program_id': program_id, 'cached': serialized is not None})
+        return result
+    def _remember(self, program_id: str, serialized: bytes):
+        self.programs[program_id] = serialized
+        self.programs.move_to_end(program_id)
+        while len(self.programs) > self.program_entries:
+            self.programs.popitem(last=False)
+
+    def statistics(self) -> Dict[str, Any]:
+        uptime_seconds = time.monotonic() - self._started
+        return {
+            'status': 'ok',
+            'uptime_seconds': uptime_seconds,
+            'requests': sum(metrics.requests for metrics in self.metrics.values()),
+            'programs': {'entries': len(self.programs), 'hits': self.hits, 'misses': self.misses},
+            'workers': [metrics.report(uptime_seconds) for metrics in self.metrics.values()]
+        }
+
+def serve_daemon(socket_path: str, workers: Optional[int] = None, program_entries: int = DEFAULT_PROGRAM_ENTRIES):
+    asyncio.run(SmileDaemon(socket_path, workers, program_entries).serve())
+
+class DaemonClient:
+    def __init__(self, socket_path: str):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._reader = self._socket.makefile('rb')
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._socket.sendall(json.dumps(payload).encode() + b'\n')
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError('Daemon closed the connection')
+        return json.loads(line)
+    def run(self, source: Optional[str] = None, input_text: str = '', program_id: Optional[str] = None,
+            optimize: bool = False, **limit_options) -> Dict[str, Any]:
+        payload = {'command': 'run', 'source': source, 'program_id': program_id, 'input': input_text, 'optimize': optimize}
+        payload.update(limit_options)
+        return self.request(payload)
+    def statistics(self) -> Dict[str, Any]:
+        return self.request({'command': 'stats'})
+    def shutdown(self) -> Dict[str, Any]:
+        return self.request({'command': 'shutdown'})
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+    def __enter__(self) -> 'DaemonClient':
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,3 +1,4 @@
+from typing import Optional
 from .tokens import CodePosition
 
 class SmileLexException(Exception):
@@ -14,4 +15,34 @@ class SmileParseException(Exception):
         super().__init__(formatted)
         self._position = position
     def location(self) -> CodePosition:
-        return self._position 
\ No newline at end of file
+        return self._position
+
+class SmileLinkException(Exception):
+    def __init__(self, message: str, position: CodePosition):
+        formatted = f'Link error at {position}: {message}'
+        super().__init__(formatted)
+        self._position = position
+    def location(self) -> CodePosition:
+        return self._position
+
+class SmileRuntimeException(Exception):
+    def __init__(self, message: str, position: Optional[CodePosition] = None):
+        formatted = f'Error: {message}'
+        super().__init__(formatted)
+        self._message = message
+        self._position = position
+    def message(self) -> str:
+        return self._message
+    def location(self) -> Optional[CodePosition]:
+        return self._position
+
+class SmileLimitException(SmileRuntimeException):
+    def __init__(self, message: str, position: Optional[CodePosition] = None, summary: Optional[dict] = None):
+        super().__init__(message, position)
+        self._summary = summary or {}
+    def summary(self) -> dict:
+        return self._summary
+
+class SmileSnapshotException(Exception):
+    def __init__(self, message: str):
+        super().__init__(f'Snapshot error: {message}')
@@ -0,0 +1,119 @@
+from typing import Callable, Tuple
+from .opcodes import Opcode, ARITHMETIC_OPCODES, COMPOUND_OPCODES
+from .ropes import plain_value
+
+class ExecutionHooks:
+    EVENTS = ('dispatch', 'variable_write', 'jump', 'call', 'return', 'input', 'output')
+    _WRITING_OPCODES = frozenset([Opcode.LET, Opcode.INNUM, Opcode.INSTR]) | ARITHMETIC_OPCODES
+    _CALL_OPCODES = frozenset([Opcode.GOSUB, Opcode.TAIL_CALL])
+
+    def __init__(self):
+        self._callbacks = {event: [] for event in self.EVENTS}
+        self._written_slots = {}
+        self._index = 0
+        self._position = None
+
+    def register(self, event: str, callback: Callable) -> Callable:
+        if event not in self._callbacks:
+            raise ValueError(f'Unknown execution event {event!r}')
+        self._callbacks[event].append(callback)
+        return callback
+    def unregister(self, event: str, callback: Callable):
+        if event not in self._callbacks:
+            raise ValueError(f'Unknown execution event {event!r}')
+        self._callbacks[event].remove(callback)
+    def active(self) -> bool:
+        return any(self._callbacks.values())
+
+    def execute(self, state):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        call_stack = state.call_stack
+        read_line = state.read_line
+        write_line = state.write_line
+        state.read_line = self._traced_input(read_line)
+        state.write_line = self._traced_output(write_line)
+        dispatch_callbacks = self._callbacks['dispatch']
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                instruction = instructions[instruction_pointer]
+                steps = instruction.operands if instruction.opcode == Opcode.SEQUENCE else (instruction,)
+                next_pointer = instruction_pointer + 1
+                for step in steps:
+                    self._index = instruction_pointer
+                    self._position = step.position
+                    for callback in dispatch_callbacks:
+                        callback(instruction_pointer, step.position, step.opcode)
+                    depth = len(call_stack)
+                    next_pointer = step.handler(state, step, instruction_pointer)
+                    self._after_step(state, step, instruction_pointer, next_pointer, depth)
+                instruction_pointer = next_pointer
+        finally:
+            state.instruction_pointer = instruction_pointer
+            state.read_line = read_line
+            state.write_line = write_line
+
+    def _after_step(self, state, step, index: int, next_pointer: int, depth: int):
+        position = step.position
+        write_callbacks = self._callbacks['variable_write']
+        if write_callbacks:
+            for slot in self._slots_written_by(step):
+                for callback in write_callbacks:
+                    callback(index, position, state.variable_names[slot], plain_value(state.frame[slot]))
+        final_step = step.operands[-1] if step.opcode in COMPOUND_OPCODES else step
+        opcode = final_step.opcode
+        if opcode == Opcode.RETURN:
+            for callback in self._callbacks['return']:
+                callback(index, position, next_pointer)
+        elif opcode in self._CALL_OPCODES:
+            if next_pointer != index + 1 or len(state.call_stack) > depth:
+                for callback in self._callbacks['call']:
+                    callback(index, position, next_pointer, state.call_stack[-1])
+        elif opcode == Opcode.GOTO:
+            if next_pointer != index + 1 or final_step.operands[1] is None:
+                for callback in self._callbacks['jump']:
+                    callback(index, position, next_pointer)
+    def _slots_written_by(self, step) -> Tuple[int, ...]:
+        slots = self._written_slots.get(step)
+        if slots is None:
+            parts = step.operands if step.opcode in COMPOUND_OPCODES else (step,)
+            slots = tuple(dict.fromkeys(part.operands[0] for part in parts if part.opcode in self._WRITING_OPCODES))
+            self._written_slots[step] = slots
+        return slots
+    def _traced_input(self, read_line: Callable[[], str]) -> Callable[[], str]:
+        input_callbacks = self._callbacks['input']
+        def read_traced_line() -> str:
+            text = read_line()
+            for callback in input_callbacks:
+                callback(self._index, self._position, text)
+            return text
+        return read_traced_line
+    def _traced_output(self, write_line: Callable) -> Callable:
+        output_callbacks = self._callbacks['output']
+        def write_traced_line(value):
+            for callback in output_callbacks:
+                callback(self._index, self._position, plain_value(value))
+            write_line(value)
+        return write_traced_line
+
+class ExecutionTracer:
+    def __init__(self, stream):
+        self.stream = stream
+    def attach(self, hooks: ExecutionHooks) -> ExecutionHooks:
+        hooks.register('dispatch', self.on_dispatch)
+        hooks.register('variable_write', self.on_variable_write)
+        hooks.register('jump', self.on_jump)
+        hooks.register('call', self.on_call)
+        hooks.register('return', self.on_return)
+        return hooks
+    def on_dispatch(self, index: int, position, opcode: Opcode):
+        self.stream.write(f'[{index}] {position} {opcode.name}\n')
+    def on_variable_write(self, index: int, position, var_name: str, value):
+        self.stream.write(f'[{index}]   {var_name} = {value!r}\n')
+    def on_jump(self, index: int, position, target: int):
+        self.stream.write(f'[{index}]   jump -> {target}\n')
+    def on_call(self, index: int, position, target: int, return_index: int):
+        self.stream.write(f'[{index}]   call -> {target} (returns to {return_index})\n')
+    def on_return(self, index: int, position, return_index: int):
+        self.stream.write(f'[{index}]   return -> {return_index}\n')
@@ -0,0 +1,272 @@
+from typing import Dict, Iterable, List, Optional, Set
+from .compiler import CompiledProgram, Compiler, Linker
+from .exceptions import SmileLexException, SmileParseException, SmileLinkException
+from .loader import source_text_lines, split_label
+from .opcodes import Opcode
+from .parser import Parser
+from .tokens import SmileToken, SmileTokenType, CodePosition, relocate_position
+
+_MAX_PENDING_SHIFTS = 64
+_ENDS_PROGRAM = 1
+_ENDS_SOURCE = 2
+
+class SourceLine:
+    __slots__ = ('text', 'label', 'code', 'tokens', 'error', 'terminator', 'target', 'target_column', 'line_number', 'index', 'epoch')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.label = None
+        self.code = None
+        self.tokens = None
+        self.error = None
+        self.terminator = 0
+        self.target = None
+        self.target_column = 0
+        self.line_number = 0
+        self.index = 0
+        self.epoch = 0
+
+class IncrementalProgram:
+    def __init__(self, lines: Iterable[str] = ()):
+        self._lines = []
+        self._shifts = []
+        self._shift_base = 0
+        self._labels = {}
+        self._references = {}
+        self._jumps = set()
+        self._relative_jumps = {}
+        self._terminators = set()
+        self._syntax_errors = set()
+        self._broken_links = set()
+        self.insert_lines(0, list(lines))
+    @classmethod
+    def from_text(cls, text: str) -> 'IncrementalProgram':
+        return cls(source_text_lines(text))
+
+    def __len__(self) -> int:
+        return len(self._lines)
+    def lines(self) -> List[str]:
+        return [record.text for record in self._lines]
+    def text(self) -> str:
+        return '\n'.join(self.lines())
+
+    def insert_lines(self, index: int, texts: List[str]):
+        if not 0 <= index <= len(self._lines):
+            raise IndexError(f'Line index {index} out of range')
+        records = [SourceLine(text) for text in texts]
+        self._lines[index:index] = records
+        self._shift(index, len(records))
+        for offset, record in enumerate(records):
+            record.index = index + offset
+            record.epoch = self._shift_base + len(self._shifts)
+            self._analyze(record, index + offset + 1)
+            self._register(record)
+        self._relink(records, {record.label for record in records if record.label is not None},
+                     [record for record in self._broken_links if self._jump_offset(record.target)],
+                     any(record.terminator for record in records))
+    def insert_line(self, index: int, text: str):
+        self.insert_lines(index, [text])
+    def replace_line(self, index: int, text: str):
+        if not 0 <= index < len(self._lines):
+            raise IndexError(f'Line index {index} out of range')
+        record = self._lines[index]
+        previous_label = record.label
+        previous_terminator = record.terminator
+        self._unregister(record)
+        record.text = text
+        self._analyze(record, index + 1)
+        self._register(record)
+        self._relink([record], {label for label in (previous_label, record.label) if label is not None}, (),
+                     bool(previous_terminator or record.terminator))
+    def delete_lines(self, index: int, count: int = 1):
+        records = self._lines[index:index + count]
+        if index < 0 or len(records) != count:
+            raise IndexError(f'Line range {index}..{index + count} out of range')
+        end = self._program_end()
+        del self._lines[index:index + count]
+        self._shift(index + count, -count)
+        for record in records:
+            self._unregister(record)
+        self._relink([], {record.label for record in records if record.label is not None},
+                     self._long_jumps(end - index - count, index) if index < end else (),
+                     any(record.terminator for record in records))
+    def delete_line(self, index: int):
+        self.delete_lines(index, 1)
+
+    def diagnostics(self) -> List[Exception]:
+        end = self._program_end()
+        found = []
+        for record in self._syntax_errors:
+            index = self._index_of(record)
+            if index < end:
+                found.append((index, 0, self._syntax_error(record, index)))
+        for record in self._broken_links:
+            index = self._index_of(record)
+            if index < end:
+                found.append((index, 1, self._check_link(record, end)))
+        found.sort(key=lambda entry: entry[:2])
+        return [error for _, _, error in found]
+    def first_error(self) -> Optional[Exception]:
+        end = self._program_end()
+        for errors, describe in ((self._syntax_errors, self._syntax_error), (self._broken_links, None)):
+            located = [(index, record) for record in errors for index in (self._index_of(record),) if index < end]
+            if located:
+                index, record = min(located, key=lambda entry: entry[0])
+                return describe(record, index) if describe is not None else self._check_link(record, end)
+        return None
+    def label_registry(self) -> Dict[str, int]:
+        source_end = self._source_end()
+        first_definitions = []
+        for label in self._labels:
+            indices = [index for record in self._labels[label] for index in (self._index_of(record),) if index < source_end]
+            if indices:
+                first_definitions.append((min(indices), label, max(indices) + 1))
+        first_definitions.sort()
+        return {label: line_number for _, label, line_number in first_definitions}
+    def compile(self) -> CompiledProgram:
+        error = self.first_error()
+        if error is not None:
+            raise error
+        end = self._program_end()
+        token_lines = [self._located_tokens(record, index + 1) for index, record in enumerate(self._lines[:end])]
+        return Linker.link_program(Compiler.compile_program(token_lines), self.label_registry())
+
+    def _analyze(self, record: SourceLine, line_number: int):
+        record.label = record.tokens = record.error = record.target = None
+        record.terminator = 0
+        record.line_number = line_number
+        line = record.text.strip()
+        if line == '.':
+            record.terminator = _ENDS_SOURCE
+            return
+        if ':' in line:
+            record.label, line = split_label(line)
+        record.code = line
+        try:
+            tokens = Parser._parse_single_line(line, line_number)
+        except (SmileLexException, SmileParseException) as load_error:
+            record.error = load_error
+            return
+        if len(tokens) == 1 and tokens[0].kind() == SmileTokenType.PERIOD:
+            record.terminator = _ENDS_PROGRAM
+            return
+        record.tokens = tokens
+        instruction = Compiler.compile_line(tokens, {})
+        control = instruction.operands[-1] if instruction.opcode == Opcode.SEQUENCE else instruction
+        if control.opcode in (Opcode.GOTO, Opcode.GOSUB) and control.operands[0] is not None:
+            record.target = control.operands[0]
+            record.target_column = control.position.column()
+    def _register(self, record: SourceLine):
+        if record.label is not None:
+            self._labels.setdefault(record.label, set()).add(record)
+        if record.error is not None:
+            self._syntax_errors.add(record)
+        if record.terminator:
+            self._terminators.add(record)
+        if record.target is not None:
+            self._jumps.add(record)
+            label = self._target_label(record.target)
+            offset = self._jump_offset(record.target)
+            if label is not None:
+                self._references.setdefault(label, set()).add(record)
+            elif offset:
+                self._relative_jumps.setdefault(offset, set()).add(record)
+    def _unregister(self, record: SourceLine):
+        if record.label is not None:
+            definitions = self._labels[record.label]
+            definitions.discard(record)
+            if not definitions:
+                del self._labels[record.label]
+        self._syntax_errors.discard(record)
+        self._terminators.discard(record)
+        self._broken_links.discard(record)
+        if record.target is not None:
+            self._jumps.discard(record)
+            label = self._target_label(record.target)
+            offset = self._jump_offset(record.target)
+            if label is not None:
+                self._references[label].discard(record)
+            elif offset:
+                jumps = self._relative_jumps[offset]
+                jumps.discard(record)
+                if not jumps:
+                    del self._relative_jumps[offset]
+    def _target_label(self, target: str) -> Optional[str]:
+        if target.startswith('"') and target.endswith('"'):
+            return target[1:-1]
+        return None
+    def _jump_offset(self, target: str) -> int:
+        if target.isdigit() or (target.startswith('-') and target[1:].isdigit()):
+            return int(target)
+        return 0
+    def _long_jumps(self, lines_after: int, lines_before: int) -> List[SourceLine]:
+        return [record for offset, jumps in self._relative_jumps.items()
+                if offset > lines_after or -offset > lines_before for record in jumps]
+
+    def _relink(self, records: List[SourceLine], labels: Set[str], relative: Iterable[SourceLine], terminators_changed: bool):
+        if terminators_changed:
+            candidates = self._jumps
+        else:
+            candidates = {record for record in records if record.target is not None}
+            for label in labels:
+                candidates.update(self._references.get(label, ()))
+            candidates.update(relative)
+        end = self._program_end()
+        for record in candidates:
+            if self._check_link(record, end) is None:
+                self._broken_links.discard(record)
+            else:
+                self._broken_links.add(record)
+    def _check_link(self, record: SourceLine, end: int) -> Optional[SmileLinkException]:
+        index = self._index_of(record)
+        if index >= end:
+            return None
+        label = self._target_label(record.target)
+        label_registry = {}
+        if label is not None:
+            line_number = self._label_line(label)
+            if line_number is not None:
+                label_registry[label] = line_number
+        try:
+            Linker._resolve_target(record.target, index, end, label_registry, CodePosition(index + 1, record.target_column))
+        except SmileLinkException as link_error:
+            return link_error
+        return None
+    def _label_line(self, label: str) -> Optional[int]:
+        source_end = self._source_end()
+        indices = [index for record in self._labels.get(label, ()) for index in (self._index_of(record),) if index < source_end]
+        return max(indices) + 1 if indices else None
+    def _syntax_error(self, record: SourceLine, index: int) -> Exception:
+        if record.line_number != index + 1:
+            try:
+                Parser._parse_single_line(record.code, index + 1)
+            except (SmileLexException, SmileParseException) as load_error:
+                record.error = load_error
+            record.line_number = index + 1
+        return record.error
+    def _located_tokens(self, record: SourceLine, line_number: int) -> List[SmileToken]:
+        if record.line_number != line_number:
+            record.tokens = [tuple.__new__(SmileToken, (token[0], token[1], relocate_position(token[2], line_number), token[3])) for token in record.tokens]
+            record.line_number = line_number
+        return record.tokens
+
+    def _program_end(self) -> int:
+        return min((self._index_of(record) for record in self._terminators), default=len(self._lines))
+    def _source_end(self) -> int:
+        return min((self._index_of(record) for record in self._terminators if record.terminator == _ENDS_SOURCE), default=len(self._lines))
+    def _index_of(self, record: SourceLine) -> int:
+        index = record.index
+        for start, delta in self._shifts[record.epoch - self._shift_base:]:
+            if index >= start:
+                index += delta
+        record.index = index
+        record.epoch = self._shift_base + len(self._shifts)
+        return index
+    def _shift(self, start: int, delta: int):
+        self._shifts.append((start, delta))
+        if len(self._shifts) > _MAX_PENDING_SHIFTS:
+            self._shift_base += len(self._shifts)
+            self._shifts = []
+            for index, record in enumerate(self._lines):
+                record.index = index
+                record.epoch = self._shift_base
@@ -0,0 +1,56 @@
+from typing import Any, Dict, Optional
+from .compiler import CompiledProgram
+from .exceptions import SmileRuntimeException
+from .hooks import ExecutionHooks
+from .limits import ExecutionLimits
+from .profiler import Profiler
+from .snapshot import SnapshotWriter
+from .state import ProgramState
+from .streams import ConsoleInput, InputProvider, OutputSink, StdoutSink
+
+class Interpreter:
+    def __init__(self, program: CompiledProgram, input_source: Optional[InputProvider] = None, output: Optional[OutputSink] = None):
+        self.program = program
+        self.input_source = input_source if input_source is not None else ConsoleInput()
+        self.output = output if output is not None else StdoutSink()
+        self.state = ProgramState(program, self.input_source, self.output)
+
+    def run(self, profiler: Optional[Profiler] = None, hooks: Optional[ExecutionHooks] = None, limits: Optional[ExecutionLimits] = None,
+            snapshots: Optional[SnapshotWriter] = None) -> int:
+        state = self.state
+        hooks = hooks if hooks is not None and hooks.active() else None
+        limits = limits if limits is not None and limits.active() else None
+        if (limits is not None or snapshots is not None) and sum(engine is not None for engine in (profiler, hooks, limits, snapshots)) > 1:
+            raise ValueError('Limits and snapshots cannot be combined with profiling, hooks or each other')
+        try:
+            if hooks is not None:
+                hooks.execute(state)
+            elif profiler is not None:
+                profiler.execute(state)
+            elif limits is not None:
+                limits.execute(state)
+            elif snapshots is not None:
+                snapshots.execute(state)
+            else:
+                self._execute(state)
+        except SmileRuntimeException as runtime_error:
+            if runtime_error.location() is None:
+                raise SmileRuntimeException(runtime_error.message(), state.instructions[state.instruction_pointer].position) from None
+            raise
+        finally:
+            self.output.flush()
+        return 0
+
+    def _execute(self, state: ProgramState):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                instruction = instructions[instruction_pointer]
+                instruction_pointer = instruction.handler(state, instruction, instruction_pointer)
+        finally:
+            state.instruction_pointer = instruction_pointer
+
+    def variables(self) -> Dict[str, Any]:
+        return self.state.variables()
@@ -1,5 +1,6 @@
+import re
 from collections import defaultdict
-from .tokens import SmileTokenType, SmileToken, CodePosition, SmileTokenCategory
+from .tokens import SmileTokenType, SmileToken, CodePosition, SmileTokenCategory, pack_position
 from .exceptions import SmileLexException
 
 class Tokenizer:
@@ -97,4 +98,74 @@ class Tokenizer:
                     tokens.append(SmileToken(SmileTokenType.GREATER, '>', CodePosition(line_number, token_start + 1)))
             else:
                 raise SmileLexException(f'Invalid character: {source_line[char_index]}', CodePosition(line_number, char_index + 1))
-        return tokens 
\ No newline at end of file
+        return tokens 
+
+_ASCII_WHITESPACE = ''.join(chr(code) for code in range(128) if chr(code).isspace())
+_WORD, _NUMBER, _STRING, _SYMBOL = range(4)
+
+def _leading_character_class(character: str):
+    if character.isalpha():
+        return _WORD
+    elif character.isdigit() or character == '-':
+        return _NUMBER
+    elif character == '"':
+        return _STRING
+    elif character in ':.=<>':
+        return _SYMBOL
+    return None
+
+_LEADING_CHARACTERS = {chr(code): _leading_character_class(chr(code)) for code in range(128)}
+
+class RegexTokenizer:
+    _KEYWORDS = dict(Tokenizer._COMMAND_MAPPING)
+    _SYMBOLS = {
+        ':': SmileTokenType.COLON,
+        '.': SmileTokenType.PERIOD,
+        '=': SmileTokenType.EQUALS,
+        '<>': SmileTokenType.NOT_EQUALS,
+        '<=': SmileTokenType.LESS_EQUAL,
+        '<': SmileTokenType.LESS,
+        '>=': SmileTokenType.GREATER_EQUAL,
+        '>': SmileTokenType.GREATER
+    }
+    _TOKEN_PATTERN = re.compile(
+        '([' + re.escape(_ASCII_WHITESPACE) + ']*)('
+        r'[A-Za-z][A-Za-z0-9]*|"[^"]*"|-?[0-9]+(?:\.[0-9]*)?|<>|<=|>='
+        '|[^' + re.escape(_ASCII_WHITESPACE) + '])'
+    )
+
+    @classmethod
+    def tokenize_line(cls, source_line: str, line_number: int):
+        if not source_line.isascii():
+            return Tokenizer.tokenize_line(source_line, line_number)
+        keyword_type = cls._KEYWORDS.get
+        symbol_type = cls._SYMBOLS.__getitem__
+        token_class_of = _LEADING_CHARACTERS.get
+        new_token = tuple.__new__
+        variable_type = SmileTokenType.VARIABLE_NAME
+        line_origin = pack_position(line_number, 0)
+        tokens = []
+        append = tokens.append
+        column = 1
+        for whitespace, token_text in cls._TOKEN_PATTERN.findall(source_line):
+            column += len(whitespace)
+            token_class = token_class_of(token_text[0])
+            if token_class == _WORD:
+                append(new_token(SmileToken, (keyword_type(token_text, variable_type), token_text, line_origin + column, token_text)))
+            elif token_class == _NUMBER:
+                if '.' in token_text:
+                    append(new_token(SmileToken, (SmileTokenType.FLOAT_DATA, token_text, line_origin + column, float(token_text))))
+                elif token_text != '-':
+                    append(new_token(SmileToken, (SmileTokenType.INTEGER_DATA, token_text, line_origin + column, int(token_text))))
+                else:
+                    raise SmileLexException('Negative sign must be followed by digits', CodePosition(line_number, column))
+            elif token_class == _SYMBOL:
+                append(new_token(SmileToken, (symbol_type(token_text), token_text, line_origin + column, None)))
+            elif token_class == _STRING:
+                if len(token_text) == 1:
+                    raise SmileLexException('Unterminated string literal', CodePosition(line_number, column))
+                append(new_token(SmileToken, (SmileTokenType.STRING_DATA, token_text, line_origin + column, token_text[1:-1])))
+            else:
+                raise SmileLexException(f'Invalid character: {token_text}', CodePosition(line_number, column))
+            column += len(token_text)
+        return tokens
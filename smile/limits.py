@@ -0,0 +1,147 @@
+import time
+from typing import Any, Dict, Optional
+from .compiler import Instruction
+from .exceptions import SmileLimitException
+from .opcodes import Opcode, COMPOUND_OPCODES
+
+_CHECKPOINT_INTERVAL = 4096
+_GROWING_OPCODES = frozenset([Opcode.ADD, Opcode.MULT])
+_CALL_OPCODES = frozenset([Opcode.GOSUB, Opcode.TAIL_CALL])
+
+class ExecutionLimits:
+    def __init__(self, max_instructions: Optional[int] = None, max_call_depth: Optional[int] = None,
+                 max_string_length: Optional[int] = None, deadline_seconds: Optional[float] = None):
+        self.max_instructions = max_instructions
+        self.max_call_depth = max_call_depth
+        self.max_string_length = max_string_length
+        self.deadline_seconds = deadline_seconds
+        self.instructions_executed = 0
+        self.elapsed_seconds = 0.0
+
+    def active(self) -> bool:
+        return any(limit is not None for limit in (self.max_instructions, self.max_call_depth, self.max_string_length, self.deadline_seconds))
+
+    def execute(self, state):
+        if self.max_string_length is not None:
+            state.instructions = [self._guard_string_growth(instruction) for instruction in state.instructions]
+        if self.max_call_depth is not None:
+            state.instructions = [self._guard_call_depth(instruction) for instruction in state.instructions]
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        call_stack = state.call_stack
+        started = time.monotonic()
+        deadline = started + self.deadline_seconds if self.deadline_seconds is not None else None
+        executed = self.instructions_executed
+        checkpoint = self._next_checkpoint(executed)
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                if executed >= checkpoint:
+                    if self.max_instructions is not None and executed >= self.max_instructions:
+                        self._exceed(state, 'instructions', f'Instruction limit of {self.max_instructions} exceeded', instruction_pointer)
+                    if deadline is not None and time.monotonic() > deadline:
+                        self._exceed(state, 'deadline', f'Deadline of {self.deadline_seconds}s exceeded', instruction_pointer)
+                    checkpoint = self._next_checkpoint(executed)
+                instruction = instructions[instruction_pointer]
+                instruction_pointer = instruction.handler(state, instruction, instruction_pointer)
+                executed += 1
+        except SmileLimitException as limit_error:
+            if limit_error.summary()['limit'] == 'call depth':
+                executed += 1
+            limit_error.summary().update({
+                'instructions_executed': executed,
+                'elapsed_seconds': time.monotonic() - started + self.elapsed_seconds,
+                'call_depth': len(call_stack),
+                'variables_defined': sum(1 for value in state.frame if value is not None)
+            })
+            raise
+        finally:
+            state.instruction_pointer = instruction_pointer
+            self.instructions_executed = max(executed, self.instructions_executed)
+            self.elapsed_seconds += time.monotonic() - started
+    def _next_checkpoint(self, executed: int) -> int:
+        checkpoint = executed + _CHECKPOINT_INTERVAL
+        if self.max_instructions is not None:
+            checkpoint = min(checkpoint, self.max_instructions)
+        return checkpoint
+
+    def _guard_call_depth(self, instruction: Instruction) -> Instruction:
+        if instruction.handler == self._execute_call:
+            return instruction
+        steps = instruction.operands if instruction.opcode in COMPOUND_OPCODES else (instruction,)
+        if not any(step.opcode in _CALL_OPCODES for step in steps):
+            return instruction
+        guarded = Instruction(instruction.opcode, instruction.operands, instruction.position)
+        guarded.handler = self._execute_call
+        guarded.cache = instruction
+        return guarded
+    def _execute_call(self, state, instruction, position: int) -> int:
+        original = instruction.cache
+        next_pointer = original.handler(state, original, position)
+        if len(state.call_stack) > self.max_call_depth:
+            self._exceed(state, 'call depth', f'Call depth limit of {self.max_call_depth} exceeded', position)
+        return next_pointer
+
+    def _guard_string_growth(self, instruction: Instruction) -> Instruction:
+        if instruction.handler in (self._execute_guarded, self._execute_call):
+            return instruction
+        steps = instruction.operands if instruction.opcode in COMPOUND_OPCODES else (instruction,)
+        if not any(self._may_grow_string(step) for step in steps):
+            return instruction
+        guarded = Instruction(instruction.opcode, instruction.operands, instruction.position)
+        guarded.handler = self._execute_guarded
+        guarded.cache = (instruction, steps)
+        return guarded
+    def _may_grow_string(self, step: Instruction) -> bool:
+        if step.opcode not in _GROWING_OPCODES:
+            return False
+        _, operand_slot, literal = step.operands
+        if operand_slot is not None:
+            return True
+        return type(literal) is (str if step.opcode == Opcode.ADD else int)
+    def _execute_guarded(self, state, instruction, position: int) -> int:
+        original, steps = instruction.cache
+        if original is steps[0]:
+            slot, operand_slot, _ = original.operands
+            frame = state.frame
+            if type(frame[slot]) in (int, float) and (operand_slot is None or type(frame[operand_slot]) in (int, float)):
+                return original.handler(state, original, position)
+        self._check_string_growth(state, steps, position)
+        return original.handler(state, original, position)
+    def _check_string_growth(self, state, steps, instruction_pointer: int):
+        frame = state.frame
+        lengths = {}
+        for step in steps:
+            if step.opcode == Opcode.LET:
+                slot, var_value = step.operands
+                lengths[slot] = len(var_value) if type(var_value) is str else None
+                continue
+            if step.opcode not in _GROWING_OPCODES:
+                continue
+            slot, operand_slot, literal = step.operands
+            current_value = frame[slot]
+            operand = literal if operand_slot is None else frame[operand_slot]
+            current_length = lengths[slot] if slot in lengths else self._string_length(current_value)
+            operand_length = lengths[operand_slot] if operand_slot in lengths else self._string_length(operand)
+            if step.opcode == Opcode.ADD:
+                result_length = current_length + operand_length if current_length is not None and operand_length is not None else None
+            elif current_length is not None and type(operand) is int:
+                result_length = current_length * max(operand, 0)
+            elif operand_length is not None and type(current_value) is int:
+                result_length = operand_length * max(current_value, 0)
+            else:
+                result_length = None
+            if result_length is not None and result_length > self.max_string_length:
+                self._exceed(state, 'string length', f'String length limit of {self.max_string_length} exceeded', instruction_pointer)
+            lengths[slot] = result_length
+    def _string_length(self, value: Any) -> Optional[int]:
+        if value is None or type(value) in (int, float):
+            return None
+        return len(value)
+    def _exceed(self, state, limit: str, message: str, instruction_pointer: int):
+        position = state.instructions[instruction_pointer].position
+        raise SmileLimitException(message, position, {'limit': limit, 'line': position.line()})
+
+def format_limit_summary(summary: Dict[str, Any]) -> str:
+    return (f"Stopped by the {summary['limit']} limit at line {summary['line']} after {summary['instructions_executed']} instructions "
+            f"in {summary['elapsed_seconds']:.3f}s (call depth {summary['call_depth']}, {summary['variables_defined']} variables defined)")
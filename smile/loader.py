@@ -0,0 +1,44 @@
+import mmap
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def split_label(line: str) -> Tuple[Optional[str], str]:
+    if ':' in line:
+        label_part, code_part = line.split(':', 1)
+        return label_part.strip(), code_part.strip()
+    return None, line
+
+def split_program_lines(raw_lines: Iterable[str]) -> Tuple[List[str], Dict[str, int]]:
+    program_lines = []
+    label_mappings = {}
+    current_line_num = 1
+    for raw_line in raw_lines:
+        line = raw_line.strip()
+        if line == '.':
+            break
+        if ':' in line:
+            label, line = split_label(line)
+            label_mappings[label] = current_line_num
+        program_lines.append(line)
+        current_line_num += 1
+    return program_lines, label_mappings
+
+def source_text_lines(text: str) -> List[str]:
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return lines
+
+def read_source_text(path: str, use_mmap: bool = False, encoding: str = 'utf-8') -> str:
+    if use_mmap:
+        with open(path, 'rb') as source_file:
+            try:
+                with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    text = str(view, encoding)
+            except ValueError:
+                text = ''
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+    with open(path, encoding=encoding) as source_file:
+        return source_file.read()
+
+def load_program_file(path: str, use_mmap: bool = False, encoding: str = 'utf-8') -> Tuple[List[str], Dict[str, int]]:
+    return split_program_lines(source_text_lines(read_source_text(path, use_mmap, encoding)))
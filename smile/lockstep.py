@@ -0,0 +1,380 @@
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from .compiler import CompiledProgram, Instruction
+from .exceptions import SmileRuntimeException
+from .interpreter import Interpreter
+from .opcodes import Opcode, ARITHMETIC_OPCODES, COMPOUND_OPCODES
+from .runtime import FlowController
+from .streams import BufferedInput, MemorySink
+
+numpy = None
+
+def _load_numpy() -> bool:
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as numpy_module
+        except ImportError:
+            return False
+        numpy = numpy_module
+    return True
+
+INPUT_SUFFIX = '.in'
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+_EXACT_FLOAT_LIMIT = 2 ** 53
+_PRODUCT_LIMIT = 2.0 ** 62
+_FLOW_OPCODES = frozenset([Opcode.END, Opcode.GOTO, Opcode.GOSUB, Opcode.RETURN, Opcode.FAIL, Opcode.TAIL_CALL])
+
+class LaneResult(NamedTuple):
+    stdout: str
+    exit_status: int
+    error: Optional[str]
+    variables: Dict[str, Any]
+    vectorized: bool
+
+class LaneGroup:
+    __slots__ = ('lanes', 'instruction_pointer', 'call_stack', 'frame')
+
+    def __init__(self, lanes, instruction_pointer: int, call_stack: Tuple[int, ...], frame: List[Any]):
+        self.lanes = lanes
+        self.instruction_pointer = instruction_pointer
+        self.call_stack = call_stack
+        self.frame = frame
+
+    def key(self) -> Tuple:
+        return (self.instruction_pointer, self.call_stack, tuple(None if values is None else values.dtype.kind for values in self.frame))
+    def select(self, keep) -> 'LaneGroup':
+        return LaneGroup(self.lanes[keep], self.instruction_pointer, self.call_stack, [None if values is None else values[keep] for values in self.frame])
+    def moved(self, instruction_pointer: int, call_stack: Tuple[int, ...]) -> 'LaneGroup':
+        return LaneGroup(self.lanes, instruction_pointer, call_stack, self.frame)
+    def merge(self, other: 'LaneGroup'):
+        self.lanes = numpy.concatenate((self.lanes, other.lanes))
+        self.frame = [None if values is None else numpy.concatenate((values, other_values)) for values, other_values in zip(self.frame, other.frame)]
+
+class LockstepEngine:
+    def __init__(self, program: CompiledProgram, input_sets: Sequence[List[str]]):
+        self.program = program
+        self.instructions = program.instructions
+        self.input_sets = input_sets
+        self.positions = [0] * len(input_sets)
+        self.outputs = [[] for _ in input_sets]
+        self.results = [None] * len(input_sets)
+        self._pending = {}
+        self._schedule_order = []
+        self._sequence = itertools.count()
+        self._marks = None
+
+    @classmethod
+    def supports(cls, program: CompiledProgram) -> bool:
+        if not _load_numpy():
+            return False
+        for instruction in program.instructions:
+            steps = instruction.operands if instruction.opcode in COMPOUND_OPCODES else (instruction,)
+            for step in steps:
+                if step.opcode == Opcode.INSTR:
+                    return False
+                elif step.opcode == Opcode.LET and not cls._is_numeric_literal(step.operands[1]):
+                    return False
+                elif step.opcode in ARITHMETIC_OPCODES and step.operands[1] is None and not cls._is_numeric_literal(step.operands[2]):
+                    return False
+                elif step.opcode in (Opcode.GOTO, Opcode.GOSUB, Opcode.TAIL_CALL) and step.operands[1] is not None:
+                    _, left_literal, _, _, right_literal = step.operands[1]
+                    if not all(literal is None or cls._is_numeric_literal(literal) for literal in (left_literal, right_literal)):
+                        return False
+        return True
+    @classmethod
+    def _is_numeric_literal(cls, value: Any) -> bool:
+        if type(value) is int:
+            return _INT64_MIN <= value <= _INT64_MAX
+        return type(value) is float
+
+    def run(self) -> List[LaneResult]:
+        if not self.supports(self.program):
+            for lane in range(len(self.input_sets)):
+                self._run_scalar(lane, 0, (), [None] * len(self.program.variable_names))
+            return self.results
+        with numpy.errstate(all='ignore'):
+            self._schedule(LaneGroup(numpy.arange(len(self.input_sets)), 0, (), [None] * len(self.program.variable_names)))
+            while self._schedule_order:
+                _, _, key = heapq.heappop(self._schedule_order)
+                group = self._pending.pop(key)
+                while True:
+                    continuations = self._execute(group)
+                    if len(continuations) != 1 or continuations[0].instruction_pointer >= len(self.instructions):
+                        break
+                    group = continuations[0]
+                    if self._schedule_order and group.instruction_pointer >= self._schedule_order[0][0]:
+                        continuations = [group]
+                        break
+                for continuation in continuations:
+                    self._schedule(continuation)
+        return self.results
+    def _schedule(self, group: LaneGroup):
+        if group.instruction_pointer >= len(self.instructions):
+            self._finish(group)
+            return
+        key = group.key()
+        waiting = self._pending.get(key)
+        if waiting is not None:
+            waiting.merge(group)
+            return
+        self._pending[key] = group
+        heapq.heappush(self._schedule_order, (group.instruction_pointer, next(self._sequence), key))
+
+    def _execute(self, group: LaneGroup) -> List[LaneGroup]:
+        instruction = self.instructions[group.instruction_pointer]
+        steps = instruction.operands if instruction.opcode in COMPOUND_OPCODES else (instruction,)
+        self._marks = {} if len(steps) > 1 else None
+        pairs = [(group, LaneGroup(group.lanes, group.instruction_pointer, group.call_stack, list(group.frame)))]
+        for step in steps:
+            pairs = [pair for group, origin in pairs for pair in self._execute_step(step, group, origin)]
+        if steps[-1].opcode in _FLOW_OPCODES:
+            return [group for group, _ in pairs]
+        return [group.moved(group.instruction_pointer + 1, group.call_stack) for group, _ in pairs]
+    def _execute_step(self, step: Instruction, group: LaneGroup, origin: LaneGroup) -> List[Tuple[LaneGroup, LaneGroup]]:
+        opcode = step.opcode
+        if opcode == Opcode.LET:
+            slot, value = step.operands
+            group.frame[slot] = numpy.full(len(group.lanes), value, dtype=numpy.int64 if type(value) is int else numpy.float64)
+        elif opcode in ARITHMETIC_OPCODES:
+            return self._execute_arithmetic(step, group, origin)
+        elif opcode == Opcode.PRINT:
+            self._execute_print(step, group)
+        elif opcode == Opcode.INNUM:
+            return self._execute_input(step, group, origin)
+        elif opcode in (Opcode.GOTO, Opcode.GOSUB, Opcode.TAIL_CALL):
+            return self._execute_jump(step, group, origin)
+        elif opcode == Opcode.RETURN:
+            if not group.call_stack:
+                return self._evict(group, origin, None)
+            return [(group.moved(group.call_stack[-1], group.call_stack[:-1]), origin)]
+        elif opcode == Opcode.END:
+            return [(group.moved(len(self.instructions), group.call_stack), origin)]
+        elif opcode == Opcode.FAIL:
+            return self._evict(group, origin, None)
+        return [(group, origin)]
+
+    def _execute_arithmetic(self, step: Instruction, group: LaneGroup, origin: LaneGroup) -> List[Tuple[LaneGroup, LaneGroup]]:
+        slot, operand_slot, literal = step.operands
+        current = group.frame[slot]
+        operand = literal if operand_slot is None else group.frame[operand_slot]
+        if operand is None:
+            return [(group, origin)]
+        if current is None:
+            return self._evict(group, origin, None)
+        if operand_slot is None:
+            operand = numpy.int64(operand) if type(operand) is int else numpy.float64(operand)
+        result, trouble = self._arithmetic(step.opcode, current, operand)
+        if trouble is not None and trouble.any():
+            keep = ~trouble
+            pairs = self._evict(group, origin, trouble)
+            if not pairs:
+                return pairs
+            group, origin = pairs[0]
+            result = result[keep]
+        group.frame[slot] = result
+        return [(group, origin)]
+    def _arithmetic(self, opcode: Opcode, current, operand):
+        if current.dtype.kind == 'i' and operand.dtype.kind == 'i':
+            if opcode == Opcode.ADD:
+                result = current + operand
+                return result, ((current ^ result) & (operand ^ result)) < 0
+            elif opcode == Opcode.SUB:
+                result = current - operand
+                return result, ((current ^ operand) & (current ^ result)) < 0
+            elif opcode == Opcode.MULT:
+                return current * operand, numpy.abs(current.astype(numpy.float64) * operand) >= _PRODUCT_LIMIT
+            trouble = (operand == 0) | ((current == _INT64_MIN) & (operand == -1))
+            return current // numpy.where(trouble, 1, operand), trouble
+        current = current.astype(numpy.float64)
+        operand = numpy.float64(operand) if numpy.ndim(operand) == 0 else operand.astype(numpy.float64)
+        if opcode == Opcode.ADD:
+            return current + operand, None
+        elif opcode == Opcode.SUB:
+            return current - operand, None
+        elif opcode == Opcode.MULT:
+            return current * operand, None
+        trouble = numpy.broadcast_to(operand == 0, current.shape)
+        return current / numpy.where(trouble, 1.0, operand), trouble
+    def _execute_print(self, step: Instruction, group: LaneGroup):
+        outputs = self.outputs
+        lanes = group.lanes.tolist()
+        self._mark(lanes)
+        for slot, literal in step.operands:
+            if slot is None:
+                text = f'{literal}\n'
+                for lane in lanes:
+                    outputs[lane].append(text)
+            elif group.frame[slot] is None:
+                for lane in lanes:
+                    outputs[lane].append('0\n')
+            else:
+                for lane, value in zip(lanes, group.frame[slot].tolist()):
+                    outputs[lane].append(f'{value}\n')
+    def _execute_input(self, step: Instruction, group: LaneGroup, origin: LaneGroup) -> List[Tuple[LaneGroup, LaneGroup]]:
+        slot, = step.operands
+        values = []
+        kinds = numpy.zeros(len(group.lanes), dtype=numpy.int8)
+        for index, lane in enumerate(group.lanes.tolist()):
+            value = self._parse_input(lane)
+            if value is None:
+                kinds[index] = 2
+                values.append(0)
+            else:
+                kinds[index] = type(value) is float
+                values.append(value)
+        pairs = []
+        for kind, dtype in ((0, numpy.int64), (1, numpy.float64)):
+            selected = kinds == kind
+            if not selected.any():
+                continue
+            typed_group = group.select(selected)
+            typed_group.frame[slot] = numpy.array([value for value, chosen in zip(values, selected.tolist()) if chosen], dtype=dtype)
+            typed_lanes = typed_group.lanes.tolist()
+            self._mark(typed_lanes)
+            for lane in typed_lanes:
+                self.positions[lane] += 1
+            pairs.append((typed_group, origin.select(selected)))
+        self._evict(group, origin, kinds == 2)
+        return pairs
+    def _mark(self, lanes: List[int]):
+        marks = self._marks
+        if marks is not None:
+            for lane in lanes:
+                if lane not in marks:
+                    marks[lane] = (len(self.outputs[lane]), self.positions[lane])
+    def _parse_input(self, lane: int) -> Any:
+        lines = self.input_sets[lane]
+        position = self.positions[lane]
+        if position >= len(lines):
+            return None
+        user_input = lines[position].strip()
+        try:
+            value = float(user_input) if '.' in user_input else int(user_input)
+        except ValueError:
+            return None
+        if type(value) is int and not _INT64_MIN <= value <= _INT64_MAX:
+            return None
+        return value
+    def _execute_jump(self, step: Instruction, group: LaneGroup, origin: LaneGroup) -> List[Tuple[LaneGroup, LaneGroup]]:
+        target, condition = step.operands
+        if condition is None:
+            taken = numpy.ones(len(group.lanes), dtype=bool)
+        else:
+            taken = self._evaluate_condition(group, condition)
+            if taken is None:
+                return self._evict(group, origin, None)
+        pairs = []
+        if target is None:
+            pairs = self._evict(group, origin, taken)
+            if not pairs:
+                return pairs
+            group, origin = pairs[0]
+            taken = numpy.zeros(len(group.lanes), dtype=bool)
+        if taken.all():
+            return [(self._jump(step, group, target), origin)]
+        elif not taken.any():
+            return [(group.moved(group.instruction_pointer + 1, group.call_stack), origin)]
+        skipped = group.select(~taken)
+        return [(self._jump(step, group.select(taken), target), origin.select(taken)),
+                (skipped.moved(group.instruction_pointer + 1, group.call_stack), origin.select(~taken))]
+    def _jump(self, step: Instruction, group: LaneGroup, target: int) -> LaneGroup:
+        call_stack = group.call_stack
+        if step.opcode == Opcode.GOSUB or (step.opcode == Opcode.TAIL_CALL and not call_stack):
+            call_stack = call_stack + (group.instruction_pointer + 1,)
+        return group.moved(target, call_stack)
+    def _evaluate_condition(self, group: LaneGroup, condition):
+        left_slot, left_literal, operator_text, right_slot, right_literal = condition
+        left = left_literal if left_slot is None else group.frame[left_slot]
+        right = right_literal if right_slot is None else group.frame[right_slot]
+        comparison = FlowController._COMPARISONS.get(operator_text)
+        if left is None or right is None or comparison is None:
+            return None
+        left_kind = self._kind_of(left)
+        right_kind = self._kind_of(right)
+        if left_kind != right_kind and bool(numpy.any(numpy.abs(left if left_kind == 'i' else right) > _EXACT_FLOAT_LIMIT)):
+            return None
+        return numpy.broadcast_to(comparison(left, right), group.lanes.shape)
+    def _kind_of(self, value) -> str:
+        if type(value) is int:
+            return 'i'
+        elif type(value) is float:
+            return 'f'
+        return value.dtype.kind
+
+    def _evict(self, group: LaneGroup, origin: LaneGroup, evicted) -> List[Tuple[LaneGroup, LaneGroup]]:
+        if evicted is None:
+            evicted = numpy.ones(len(group.lanes), dtype=bool)
+        if not evicted.any():
+            return [(group, origin)]
+        frame = origin.frame
+        lanes = origin.lanes[evicted].tolist()
+        values = [None if slot_values is None else slot_values[evicted].tolist() for slot_values in frame]
+        for index, lane in enumerate(lanes):
+            if self._marks and lane in self._marks:
+                output_length, self.positions[lane] = self._marks.pop(lane)
+                del self.outputs[lane][output_length:]
+            self._run_scalar(lane, origin.instruction_pointer, origin.call_stack, [None if slot_values is None else slot_values[index] for slot_values in values])
+        if evicted.all():
+            return []
+        keep = ~evicted
+        return [(group.select(keep), origin.select(keep))]
+    def _run_scalar(self, lane: int, instruction_pointer: int, call_stack: Tuple[int, ...], frame: List[Any]):
+        captured = MemorySink()
+        interpreter = Interpreter(self.program, BufferedInput(self.input_sets[lane][self.positions[lane]:]), captured)
+        state = interpreter.state
+        state.frame = frame
+        state.call_stack = list(call_stack)
+        state.instruction_pointer = instruction_pointer
+        exit_status = 0
+        error = None
+        try:
+            interpreter.run()
+        except SmileRuntimeException as runtime_error:
+            captured.write_line(runtime_error)
+            exit_status = 1
+        except Exception as unexpected_error:
+            exit_status = 1
+            error = f'{type(unexpected_error).__name__}: {unexpected_error}'
+        stdout = ''.join(self.outputs[lane]) + captured.getvalue()
+        self.outputs[lane] = None
+        self.results[lane] = LaneResult(stdout, exit_status, error, interpreter.variables(), False)
+    def _finish(self, group: LaneGroup):
+        names = self.program.variable_names
+        columns = [(name, values.tolist()) for name, values in zip(names, group.frame) if values is not None]
+        for index, lane in enumerate(group.lanes.tolist()):
+            variables = {name: values[index] for name, values in columns}
+            self.results[lane] = LaneResult(''.join(self.outputs[lane]), 0, None, variables, True)
+            self.outputs[lane] = None
+
+def run_lockstep(program: CompiledProgram, input_sets: Sequence[List[str]]) -> List[LaneResult]:
+    return LockstepEngine(program, input_sets).run()
+
+def discover_input_sets(directory: str) -> List[Tuple[str, str]]:
+    return [(entry[:-len(INPUT_SUFFIX)], os.path.join(directory, entry))
+            for entry in sorted(os.listdir(directory)) if entry.endswith(INPUT_SUFFIX)]
+
+def load_input_set(path: str) -> List[str]:
+    with open(path) as input_file:
+        lines = input_file.read().split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return lines
+
+def run_lockstep_files(program: CompiledProgram, input_directory: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    input_sets = discover_input_sets(input_directory)
+    results = run_lockstep(program, [load_input_set(path) for _, path in input_sets])
+    return {
+        'lanes': len(results),
+        'vectorized': LockstepEngine.supports(program),
+        'scalar_lanes': sum(1 for result in results if not result.vectorized),
+        'failed': sum(1 for result in results if result.exit_status != 0),
+        'wall_seconds': time.perf_counter() - started,
+        'results': [{'name': name, 'input': path, 'exit_status': result.exit_status, 'stdout': result.stdout, 'error': result.error}
+                    for (name, path), result in zip(input_sets, results)]
+    }
@@ -0,0 +1,228 @@
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from .compiler import CompiledProgram, Instruction
+from .exceptions import SmileRuntimeException
+from .opcodes import Opcode, ARITHMETIC_OPCODES, COMPOUND_OPCODES
+from .ropes import StringRope, plain_value
+from .runtime import FlowController
+
+DEFAULT_MEMO_SIZE = 1024
+MIN_BODY_SIZE = 4
+
+def _key_of(value):
+    value_type = type(value)
+    if value_type is float:
+        return (float, value.hex())
+    if value_type is StringRope:
+        return (str, value.text())
+    return (value_type, value)
+
+class PureSubroutine:
+    def __init__(self, entry: int, label: str, body: FrozenSet[int], key_slots: Tuple[int, ...], effect_slots: Tuple[int, ...], capacity: int):
+        self.entry = entry
+        self.label = label
+        self.body = body
+        self.key_slots = key_slots
+        self.effect_slots = effect_slots
+        self.capacity = capacity
+        self.results = OrderedDict()
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+
+    def store(self, key: Tuple, effect: Tuple):
+        self.results[key] = effect
+        if len(self.results) > self.capacity:
+            self.results.popitem(last=False)
+
+class SubroutineAnalyzer:
+    _IMPURE_OPCODES = frozenset([Opcode.PRINT, Opcode.INNUM, Opcode.INSTR, Opcode.END, Opcode.FAIL, Opcode.GOSUB, Opcode.TAIL_CALL])
+
+    @classmethod
+    def find_pure_subroutines(cls, program: CompiledProgram, capacity: int = DEFAULT_MEMO_SIZE) -> Dict[int, PureSubroutine]:
+        labels_by_line = {line_number: label for label, line_number in program.label_registry.items()}
+        routines = {}
+        for entry in sorted(cls._call_targets(program.instructions)):
+            analysis = cls.analyze(program.instructions, entry)
+            if analysis is None:
+                continue
+            body, key_slots, effect_slots = analysis
+            line_number = program.instructions[entry].position.line()
+            label = labels_by_line.get(line_number, f'line {line_number}')
+            routines[entry] = PureSubroutine(entry, label, body, key_slots, effect_slots, capacity)
+        return routines
+    @classmethod
+    def analyze(cls, instructions: List[Instruction], entry: int) -> Optional[Tuple[FrozenSet[int], Tuple[int, ...], Tuple[int, ...]]]:
+        successors = {}
+        pending = [entry]
+        has_loop = False
+        while pending:
+            index = pending.pop()
+            if index in successors:
+                continue
+            if index >= len(instructions):
+                return None
+            following = cls._successors(instructions[index], index)
+            if following is None:
+                return None
+            successors[index] = following
+            has_loop = has_loop or any(target <= index for target in following)
+            pending.extend(following)
+        if not has_loop and len(successors) < MIN_BODY_SIZE:
+            return None
+        defined_on_entry = cls._must_define(instructions, entry, successors)
+        exposed = set()
+        writes = set()
+        defined_at_exit = None
+        for index in successors:
+            defined = set(defined_on_entry[index])
+            for step in cls._steps(instructions[index]):
+                for slot in cls._reads(step):
+                    if slot not in defined:
+                        exposed.add(slot)
+                written = cls._write(step)
+                if written is not None:
+                    writes.add(written)
+                    defined.add(written)
+            if not successors[index]:
+                defined_at_exit = defined if defined_at_exit is None else defined_at_exit & defined
+        if defined_at_exit is None:
+            return None
+        key_slots = tuple(sorted(exposed | (writes - defined_at_exit)))
+        return frozenset(successors), key_slots, tuple(sorted(writes))
+    @classmethod
+    def _call_targets(cls, instructions: List[Instruction]) -> Set[int]:
+        targets = set()
+        for instruction in instructions:
+            for step in cls._steps(instruction):
+                if step.opcode == Opcode.GOSUB and step.operands[0] is not None:
+                    targets.add(step.operands[0])
+        return targets
+    @classmethod
+    def _steps(cls, instruction: Instruction) -> Tuple[Instruction, ...]:
+        if instruction.opcode in COMPOUND_OPCODES:
+            return instruction.operands
+        return (instruction,)
+    @classmethod
+    def _successors(cls, instruction: Instruction, index: int) -> Optional[List[int]]:
+        steps = cls._steps(instruction)
+        for step in steps:
+            if step.opcode in cls._IMPURE_OPCODES:
+                return None
+        final_step = steps[-1]
+        if final_step.opcode == Opcode.RETURN:
+            return []
+        if final_step.opcode == Opcode.GOTO:
+            target, condition = final_step.operands
+            if target is None:
+                return None
+            return [target] if condition is None else [target, index + 1]
+        return [index + 1]
+    @classmethod
+    def _reads(cls, step: Instruction) -> Tuple[int, ...]:
+        if step.opcode in ARITHMETIC_OPCODES:
+            slot, operand_slot, _ = step.operands
+            return (slot,) if operand_slot is None else (slot, operand_slot)
+        if step.opcode == Opcode.GOTO and step.operands[1] is not None:
+            left_slot, _, _, right_slot, _ = step.operands[1]
+            return tuple(slot for slot in (left_slot, right_slot) if slot is not None)
+        return ()
+    @classmethod
+    def _write(cls, step: Instruction) -> Optional[int]:
+        if step.opcode == Opcode.LET or step.opcode in ARITHMETIC_OPCODES:
+            return step.operands[0]
+        return None
+    @classmethod
+    def _must_define(cls, instructions: List[Instruction], entry: int, successors: Dict[int, List[int]]) -> Dict[int, FrozenSet[int]]:
+        universe = frozenset(slot for index in successors for step in cls._steps(instructions[index]) for slot in (cls._write(step),) if slot is not None)
+        defined_on_entry = {index: universe for index in successors}
+        defined_on_entry[entry] = frozenset()
+        changed = True
+        while changed:
+            changed = False
+            for index in sorted(successors):
+                defined = set(defined_on_entry[index])
+                for step in cls._steps(instructions[index]):
+                    written = cls._write(step)
+                    if written is not None:
+                        defined.add(written)
+                for target in successors[index]:
+                    merged = defined_on_entry[target] & defined if target != entry else frozenset()
+                    if merged != defined_on_entry[target]:
+                        defined_on_entry[target] = frozenset(merged)
+                        changed = True
+        return defined_on_entry
+
+class MemoizedCalls:
+    @classmethod
+    def execute_call(cls, state, instruction, position: int) -> int:
+        target, condition = instruction.operands
+        if condition is not None and not FlowController._evaluate_condition(state, instruction, condition):
+            return position + 1
+        routine = instruction.cache
+        frame = state.frame
+        key = tuple([_key_of(frame[slot]) for slot in routine.key_slots])
+        effect = routine.results.get(key)
+        if effect is not None:
+            routine.results.move_to_end(key)
+            routine.hits += 1
+            for slot, value in zip(routine.effect_slots, effect):
+                frame[slot] = value
+            return position + 1
+        routine.misses += 1
+        routine.pending.append((len(state.call_stack), key))
+        state.call_stack.append(position + 1)
+        return target
+    @classmethod
+    def execute_return(cls, state, instruction, position: int) -> int:
+        call_stack = state.call_stack
+        if not call_stack:
+            raise SmileRuntimeException("RETURN without matching subroutine call", instruction.position)
+        return_address = call_stack.pop()
+        for routine in instruction.cache:
+            if routine.pending and routine.pending[-1][0] == len(call_stack):
+                _, key = routine.pending.pop()
+                routine.store(key, tuple([plain_value(state.frame[slot]) for slot in routine.effect_slots]))
+        return return_address
+
+class SubroutineMemoizer:
+    def __init__(self, program: CompiledProgram, capacity: int = DEFAULT_MEMO_SIZE):
+        self.program = program
+        self.routines = SubroutineAnalyzer.find_pure_subroutines(program, capacity)
+        self._returns = {}
+        for routine in self.routines.values():
+            for index in routine.body:
+                if SubroutineAnalyzer._steps(program.instructions[index])[-1].opcode == Opcode.RETURN:
+                    self._returns.setdefault(index, []).append(routine)
+
+    def install(self, state):
+        state.instructions = [self._patch(instruction, index) for index, instruction in enumerate(state.instructions)]
+    def _patch(self, instruction: Instruction, index: int) -> Instruction:
+        if instruction.opcode == Opcode.SEQUENCE:
+            steps = tuple(self._patch(step, index) for step in instruction.operands)
+            if all(patched is original for patched, original in zip(steps, instruction.operands)):
+                return instruction
+            return Instruction(Opcode.SEQUENCE, steps, instruction.position)
+        if instruction.opcode == Opcode.GOSUB and instruction.operands[0] in self.routines:
+            patched = Instruction(Opcode.GOSUB, instruction.operands, instruction.position)
+            patched.handler = MemoizedCalls.execute_call
+            patched.cache = self.routines[instruction.operands[0]]
+            return patched
+        if instruction.opcode == Opcode.RETURN and index in self._returns:
+            patched = Instruction(Opcode.RETURN, instruction.operands, instruction.position)
+            patched.handler = MemoizedCalls.execute_return
+            patched.cache = tuple(self._returns[index])
+            return patched
+        return instruction
+
+    def statistics(self) -> Dict[str, Dict[str, int]]:
+        return {routine.label: {'hits': routine.hits, 'misses': routine.misses, 'entries': len(routine.results)}
+                for routine in self.routines.values()}
+    def format_statistics(self) -> str:
+        lines = [f'{"Subroutine":>18} {"Hits":>10} {"Misses":>10} {"Hit %":>7} {"Entries":>8}  Inputs']
+        for routine in self.routines.values():
+            calls = routine.hits + routine.misses
+            hit_rate = routine.hits / calls * 100 if calls else 0.0
+            inputs = ' '.join(self.program.variable_names[slot] for slot in routine.key_slots) or '-'
+            lines.append(f'{routine.label:>18} {routine.hits:>10} {routine.misses:>10} {hit_rate:>7.1f} {len(routine.results):>8}  {inputs}')
+        return '\n'.join(lines)
@@ -0,0 +1,25 @@
+from enum import IntEnum
+
+class Opcode(IntEnum):
+    NOP = 0
+    LET = 1
+    PRINT = 2
+    END = 3
+    INNUM = 4
+    INSTR = 5
+    ADD = 6
+    SUB = 7
+    MULT = 8
+    DIV = 9
+    GOTO = 10
+    GOSUB = 11
+    RETURN = 12
+    FAIL = 13
+    SEQUENCE = 14
+    ARITHMETIC_JUMP = 15
+    ASSIGN_ARITHMETIC = 16
+    TAIL_CALL = 17
+
+CONTROL_OPCODES = frozenset([Opcode.END, Opcode.GOTO, Opcode.GOSUB, Opcode.RETURN, Opcode.FAIL])
+ARITHMETIC_OPCODES = frozenset([Opcode.ADD, Opcode.SUB, Opcode.MULT, Opcode.DIV])
+COMPOUND_OPCODES = frozenset([Opcode.SEQUENCE, Opcode.ARITHMETIC_JUMP, Opcode.ASSIGN_ARITHMETIC])
@@ -0,0 +1,186 @@
+from typing import Dict, List, Optional, Set
+from .compiler import CompiledProgram, Instruction
+from .exceptions import SmileRuntimeException
+from .opcodes import Opcode, ARITHMETIC_OPCODES, COMPOUND_OPCODES
+from .runtime import ArithmeticEngine
+from .tokens import CodePosition
+
+_MAX_FOLDED_LENGTH = 4096
+
+class OptimizationReport:
+    REWRITES = ('unreachable', 'constant-fold', 'assign-arithmetic', 'arithmetic-jump', 'tail-call')
+
+    def __init__(self, instructions_before: int = 0):
+        self.instructions_before = instructions_before
+        self.instructions_after = instructions_before
+        self.entries = []
+    def record(self, rewrite: str, position: CodePosition):
+        self.entries.append((rewrite, position))
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(self.REWRITES, 0)
+        for rewrite, _ in self.entries:
+            counts[rewrite] += 1
+        return counts
+    def format(self) -> str:
+        lines = [f'Optimized {self.instructions_before} instructions to {self.instructions_after}']
+        for rewrite, count in self.counts().items():
+            lines.append(f'  {rewrite}: {count}')
+        for rewrite, position in self.entries:
+            lines.append(f'  {position}: {rewrite}')
+        return '\n'.join(lines)
+
+class PeepholeOptimizer:
+    _JUMP_OPCODES = frozenset([Opcode.GOTO, Opcode.GOSUB, Opcode.TAIL_CALL])
+
+    @classmethod
+    def optimize(cls, program: CompiledProgram) -> OptimizationReport:
+        instructions = list(program.instructions)
+        report = OptimizationReport(len(instructions))
+        removed = cls._remove_unreachable(instructions, report)
+        targets = cls._jump_targets(instructions, removed)
+        cls._fold_constants(instructions, removed, targets, report)
+        cls._fuse_pairs(instructions, removed, targets, report)
+        cls._convert_tail_calls(instructions, removed, report)
+        program.instructions = cls._compact(instructions, removed)
+        program.optimization_report = report
+        report.instructions_after = len(program.instructions)
+        return report
+    @classmethod
+    def _final_step(cls, instruction: Instruction) -> Instruction:
+        if instruction.opcode in COMPOUND_OPCODES:
+            return instruction.operands[-1]
+        return instruction
+    @classmethod
+    def _successors(cls, instruction: Instruction, index: int) -> List[int]:
+        final_step = cls._final_step(instruction)
+        opcode = final_step.opcode
+        if opcode in (Opcode.END, Opcode.RETURN, Opcode.FAIL):
+            return []
+        if opcode in cls._JUMP_OPCODES:
+            target, condition = final_step.operands
+            successors = [] if target is None else [target]
+            if condition is not None or opcode != Opcode.GOTO:
+                successors.append(index + 1)
+            return successors
+        return [index + 1]
+    @classmethod
+    def _remove_unreachable(cls, instructions: List[Instruction], report: OptimizationReport) -> Set[int]:
+        reachable = set()
+        pending = [0] if instructions else []
+        while pending:
+            index = pending.pop()
+            if index in reachable or index >= len(instructions):
+                continue
+            reachable.add(index)
+            pending.extend(cls._successors(instructions[index], index))
+        removed = set()
+        for index, instruction in enumerate(instructions):
+            if index not in reachable:
+                removed.add(index)
+                report.record('unreachable', instruction.position)
+        return removed
+    @classmethod
+    def _jump_targets(cls, instructions: List[Instruction], removed: Set[int]) -> Set[int]:
+        targets = set()
+        for index, instruction in enumerate(instructions):
+            if index in removed:
+                continue
+            final_step = cls._final_step(instruction)
+            if final_step.opcode in cls._JUMP_OPCODES and final_step.operands[0] is not None:
+                targets.add(final_step.operands[0])
+        return targets
+    @classmethod
+    def _fold_constants(cls, instructions: List[Instruction], removed: Set[int], targets: Set[int], report: OptimizationReport):
+        for index, instruction in enumerate(instructions):
+            if index in removed or instruction.opcode != Opcode.LET:
+                continue
+            slot, var_value = instruction.operands
+            following = index + 1
+            while following < len(instructions) and following not in targets:
+                folded_value = cls._fold_step(instructions[following], slot, var_value)
+                if folded_value is None:
+                    break
+                var_value = folded_value
+                removed.add(following)
+                report.record('constant-fold', instructions[following].position)
+                following += 1
+            if following > index + 1:
+                instructions[index] = Instruction(Opcode.LET, (slot, var_value), instruction.position)
+    @classmethod
+    def _fold_step(cls, instruction: Instruction, slot: int, var_value) -> Optional[object]:
+        if instruction.opcode not in ARITHMETIC_OPCODES:
+            return None
+        target_slot, operand_slot, literal = instruction.operands
+        if target_slot != slot or operand_slot is not None:
+            return None
+        kernel = ArithmeticEngine._KERNELS[instruction.opcode].get((type(var_value), type(literal)))
+        if kernel is None or cls._too_large(instruction.opcode, var_value, literal):
+            return None
+        try:
+            folded_value = kernel(var_value, literal)
+        except (SmileRuntimeException, ArithmeticError):
+            return None
+        return folded_value
+    @classmethod
+    def _too_large(cls, opcode: Opcode, left_value, right_value) -> bool:
+        if opcode == Opcode.ADD:
+            if type(left_value) is str:
+                return len(left_value) + len(right_value) > _MAX_FOLDED_LENGTH
+            return False
+        if opcode != Opcode.MULT:
+            return False
+        if type(left_value) is str or type(right_value) is str:
+            text, count = (left_value, right_value) if type(left_value) is str else (right_value, left_value)
+            return len(text) * count > _MAX_FOLDED_LENGTH
+        if type(left_value) is int and type(right_value) is int:
+            return left_value.bit_length() + right_value.bit_length() > _MAX_FOLDED_LENGTH
+        return False
+    @classmethod
+    def _fuse_pairs(cls, instructions: List[Instruction], removed: Set[int], targets: Set[int], report: OptimizationReport):
+        for index in range(len(instructions) - 1):
+            following = index + 1
+            if index in removed or following in removed or following in targets:
+                continue
+            first, second = instructions[index], instructions[following]
+            if first.opcode == Opcode.LET and second.opcode in ARITHMETIC_OPCODES and second.operands[0] == first.operands[0]:
+                instructions[index] = Instruction(Opcode.ASSIGN_ARITHMETIC, (first, second), first.position)
+                report.record('assign-arithmetic', second.position)
+            elif first.opcode in ARITHMETIC_OPCODES and second.opcode == Opcode.GOTO and second.operands[1] is not None:
+                instructions[index] = Instruction(Opcode.ARITHMETIC_JUMP, (first, second), first.position)
+                report.record('arithmetic-jump', second.position)
+            else:
+                continue
+            removed.add(following)
+    @classmethod
+    def _convert_tail_calls(cls, instructions: List[Instruction], removed: Set[int], report: OptimizationReport):
+        for index in range(len(instructions) - 1):
+            first, second = instructions[index], instructions[index + 1]
+            if index in removed or index + 1 in removed:
+                continue
+            if first.opcode == Opcode.GOSUB and second.opcode == Opcode.RETURN:
+                instructions[index] = Instruction(Opcode.TAIL_CALL, first.operands, first.position)
+                report.record('tail-call', first.position)
+    @classmethod
+    def _compact(cls, instructions: List[Instruction], removed: Set[int]) -> List[Instruction]:
+        new_indexes = {}
+        kept = []
+        for index, instruction in enumerate(instructions):
+            if index not in removed:
+                new_indexes[index] = len(kept)
+                kept.append(instruction)
+        new_indexes[len(instructions)] = len(kept)
+        for instruction in kept:
+            cls._remap_targets(instruction, new_indexes)
+        return kept
+    @classmethod
+    def _remap_targets(cls, instruction: Instruction, new_indexes: Dict[int, int]):
+        if instruction.opcode in COMPOUND_OPCODES:
+            for step in instruction.operands:
+                cls._remap_targets(step, new_indexes)
+        elif instruction.opcode in cls._JUMP_OPCODES:
+            target, condition = instruction.operands
+            if target is not None:
+                instruction.operands = (new_indexes[target], condition)
+
+def optimize_program(program: CompiledProgram) -> OptimizationReport:
+    return PeepholeOptimizer.optimize(program)
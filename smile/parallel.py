@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .compiler import CompiledProgram, Compiler, Linker, compile_source
+from .parser import Parser, tokenize_program
+from .tokens import SmileTokenType, TokenStream
+
+MIN_CHUNK_LINES = 2048
+_STOP_PERIOD = 1
+_STOP_ERROR = 2
+
+def _parse_chunk(chunk: Tuple[List[str], int]) -> Tuple[bytes, int, int]:
+    source_lines, first_line_number = chunk
+    stream = TokenStream()
+    for offset, source_line in enumerate(source_lines):
+        try:
+            tokens = Parser._parse_single_line(source_line, first_line_number + offset)
+        except Exception:
+            return stream.serialize(), _STOP_ERROR, offset
+        if len(tokens) == 1 and tokens[0].kind() == SmileTokenType.PERIOD:
+            return stream.serialize(), _STOP_PERIOD, offset
+        stream.append_line(tokens)
+    return stream.serialize(), 0, len(source_lines)
+
+def _split_chunks(source_lines: List[str], chunk_lines: int) -> List[Tuple[List[str], int]]:
+    return [(source_lines[start:start + chunk_lines], start + 1) for start in range(0, len(source_lines), chunk_lines)]
+
+def parse_source_parallel(source_lines: List[str], workers: Optional[int] = None, chunk_lines: Optional[int] = None) -> TokenStream:
+    workers = workers or os.cpu_count() or 1
+    chunk_lines = chunk_lines or max(MIN_CHUNK_LINES, -(-len(source_lines) // (workers * 4)))
+    chunks = _split_chunks(source_lines, chunk_lines)
+    if workers == 1 or len(chunks) <= 1:
+        return tokenize_program(source_lines)
+    stream = TokenStream()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    futures = [executor.submit(_parse_chunk, chunk) for chunk in chunks]
+    try:
+        for future, (chunk_source, first_line_number) in zip(futures, chunks):
+            data, stop, offset = future.result()
+            stream.extend(TokenStream.deserialize(data))
+            if stop == _STOP_ERROR:
+                Parser._parse_single_line(chunk_source[offset], first_line_number + offset)
+            if stop:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+    return stream
+
+def compile_token_stream(stream: TokenStream, label_registry: Dict[str, int]) -> CompiledProgram:
+    return Linker.link_program(Compiler.compile_program(stream.token_lines()), label_registry)
+
+def compile_source_parallel(source_lines: List[str], label_registry: Dict[str, int], workers: Optional[int] = None) -> CompiledProgram:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(source_lines) <= MIN_CHUNK_LINES:
+        return compile_source(source_lines, label_registry)
+    return compile_token_stream(parse_source_parallel(source_lines, workers), label_registry)
@@ -1,9 +1,17 @@
 from typing import List, Iterable
-from .tokens import SmileToken, SmileTokenType, CodePosition
-from .lexer import Tokenizer
+from .tokens import SmileToken, SmileTokenType, CodePosition, TokenStream
+from .lexer import RegexTokenizer
 from .exceptions import SmileParseException
 
 class Parser:
+    _ASSIGNMENT_TYPES = frozenset([SmileTokenType.ASSIGN, SmileTokenType.ADDITION, SmileTokenType.SUBTRACTION, SmileTokenType.MULTIPLICATION, SmileTokenType.DIVISION])
+    _INPUT_TYPES = frozenset([SmileTokenType.NUMERIC_INPUT, SmileTokenType.TEXT_INPUT])
+    _JUMP_TYPES = frozenset([SmileTokenType.JUMP, SmileTokenType.SUBROUTINE_CALL])
+    _BARE_TYPES = frozenset([SmileTokenType.TERMINATE, SmileTokenType.SUBROUTINE_RETURN])
+    _VALUE_TYPES = frozenset([SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA, SmileTokenType.STRING_DATA, SmileTokenType.VARIABLE_NAME])
+    _JUMP_TARGET_TYPES = frozenset([SmileTokenType.INTEGER_DATA, SmileTokenType.STRING_DATA, SmileTokenType.VARIABLE_NAME])
+    _COMPARISON_TYPES = frozenset([SmileTokenType.EQUALS, SmileTokenType.NOT_EQUALS, SmileTokenType.LESS, SmileTokenType.LESS_EQUAL, SmileTokenType.GREATER, SmileTokenType.GREATER_EQUAL])
+
     @classmethod
     def parse_source(cls, source_lines: List[str]) -> Iterable[List[SmileToken]]:
         for line_num, source_line in enumerate(source_lines, 1):
@@ -13,7 +21,7 @@ class Parser:
             yield tokens
     @classmethod
     def _parse_single_line(cls, source_line: str, line_number: int) -> List[SmileToken]:
-        tokens = Tokenizer.tokenize_line(source_line, line_number)
+        tokens = RegexTokenizer.tokenize_line(source_line, line_number)
         if not tokens:
             raise SmileParseException('Empty program lines are not allowed', CodePosition(line_number, len(source_line) + 1))
         token_index = 0
@@ -31,15 +39,15 @@ class Parser:
         return tokens
     @classmethod
     def _validate_statement_arguments(cls, tokens: List[SmileToken], start_index: int, statement_type: SmileTokenType):
-        if statement_type in [SmileTokenType.ASSIGN, SmileTokenType.ADDITION, SmileTokenType.SUBTRACTION, SmileTokenType.MULTIPLICATION, SmileTokenType.DIVISION]:
+        if statement_type in cls._ASSIGNMENT_TYPES:
             cls._validate_assignment_statement(tokens, start_index)
         elif statement_type == SmileTokenType.OUTPUT:
             cls._validate_output_statement(tokens, start_index)
-        elif statement_type in [SmileTokenType.NUMERIC_INPUT, SmileTokenType.TEXT_INPUT]:
+        elif statement_type in cls._INPUT_TYPES:
             cls._validate_input_statement(tokens, start_index)
-        elif statement_type in [SmileTokenType.JUMP, SmileTokenType.SUBROUTINE_CALL]:
+        elif statement_type in cls._JUMP_TYPES:
             cls._validate_jump_statement(tokens, start_index)
-        elif statement_type in [SmileTokenType.TERMINATE, SmileTokenType.SUBROUTINE_RETURN]:
+        elif statement_type in cls._BARE_TYPES:
             pass
         else:
             raise SmileParseException(f'Invalid statement type: {statement_type}', tokens[start_index - 1].location())
@@ -75,19 +83,19 @@ class Parser:
             cls._validate_value(tokens[start_index + 4])
     @classmethod
     def _validate_value(cls, token: SmileToken):
-        valid_types = [SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA, SmileTokenType.STRING_DATA, SmileTokenType.VARIABLE_NAME]
-        if token.kind() not in valid_types:
+        if token.kind() not in cls._VALUE_TYPES:
             raise SmileParseException('Invalid value type', token.location())
     @classmethod
     def _validate_jump_target(cls, token: SmileToken):
-        valid_types = [SmileTokenType.INTEGER_DATA, SmileTokenType.STRING_DATA, SmileTokenType.VARIABLE_NAME]
-        if token.kind() not in valid_types:
+        if token.kind() not in cls._JUMP_TARGET_TYPES:
             raise SmileParseException('Invalid jump target', token.location())
     @classmethod
     def _validate_comparison_operator(cls, token: SmileToken):
-        valid_types = [SmileTokenType.EQUALS, SmileTokenType.NOT_EQUALS, SmileTokenType.LESS, SmileTokenType.LESS_EQUAL, SmileTokenType.GREATER, SmileTokenType.GREATER_EQUAL]
-        if token.kind() not in valid_types:
+        if token.kind() not in cls._COMPARISON_TYPES:
             raise SmileParseException('Invalid comparison operator', token.location())
 
 def process_source(source_lines: List[str]) -> Iterable[List[SmileToken]]:
-    return Parser.parse_source(source_lines) 
\ No newline at end of file
+    return Parser.parse_source(source_lines)
+
+def tokenize_program(source_lines: List[str]) -> TokenStream:
+    return TokenStream.from_token_lines(Parser.parse_source(source_lines))
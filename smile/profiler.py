@@ -0,0 +1,117 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+class Profiler:
+    def __init__(self, program, source_lines: Optional[List[str]] = None):
+        self.program = program
+        self.source_lines = source_lines
+        self.instruction_counts = [0] * len(program.instructions)
+        self.instruction_seconds = [0.0] * len(program.instructions)
+        self.label_calls = {}
+        self.label_seconds = {}
+        self.stack_seconds = {}
+        self.total_seconds = 0.0
+        self._labels_by_line = {line_number: label for label, line_number in program.label_registry.items()}
+        self._frames = []
+        self._active_labels = {}
+
+    def execute(self, state):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        call_stack = state.call_stack
+        counts = self.instruction_counts
+        seconds = self.instruction_seconds
+        stack_seconds = self.stack_seconds
+        clock = time.perf_counter
+        run_started = clock()
+        while len(self._frames) < len(call_stack):
+            self._frames.append(('(resumed)', run_started))
+        stack_key = self._stack_key()
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                instruction = instructions[instruction_pointer]
+                depth = len(call_stack)
+                started = clock()
+                next_pointer = instruction.handler(state, instruction, instruction_pointer)
+                finished = clock()
+                elapsed = finished - started
+                counts[instruction_pointer] += 1
+                seconds[instruction_pointer] += elapsed
+                key = (stack_key, instruction_pointer)
+                stack_seconds[key] = stack_seconds.get(key, 0.0) + elapsed
+                if len(call_stack) != depth:
+                    self._sync_frames(state, len(call_stack), next_pointer, finished)
+                    stack_key = self._stack_key()
+                instruction_pointer = next_pointer
+        finally:
+            state.instruction_pointer = instruction_pointer
+            finished = clock()
+            self.total_seconds += finished - run_started
+            self._sync_frames(state, 0, instruction_pointer, finished)
+
+    def _sync_frames(self, state, depth: int, entry_pointer: int, now: float):
+        while len(self._frames) > depth:
+            label, started = self._frames.pop()
+            self._active_labels[label] -= 1
+            if not self._active_labels[label]:
+                self.label_seconds[label] = self.label_seconds.get(label, 0.0) + now - started
+        while len(self._frames) < depth:
+            label = self._label_at(state, entry_pointer)
+            self._frames.append((label, now))
+            self.label_calls[label] = self.label_calls.get(label, 0) + 1
+            self._active_labels[label] = self._active_labels.get(label, 0) + 1
+    def _label_at(self, state, instruction_pointer: int) -> str:
+        if instruction_pointer >= len(state.instructions):
+            return '(end)'
+        line_number = state.instructions[instruction_pointer].position.line()
+        return self._labels_by_line.get(line_number, f'line {line_number}')
+    def _stack_key(self) -> Tuple[str, ...]:
+        return ('main',) + tuple(label for label, _ in self._frames)
+
+    def line_statistics(self) -> Dict[int, Tuple[int, float]]:
+        lines = {}
+        for index, instruction in enumerate(self.program.instructions):
+            if not self.instruction_counts[index]:
+                continue
+            line_number = instruction.position.line()
+            count, seconds = lines.get(line_number, (0, 0.0))
+            lines[line_number] = (count + self.instruction_counts[index], seconds + self.instruction_seconds[index])
+        return lines
+    def opcode_statistics(self) -> Dict[str, Tuple[int, float]]:
+        opcodes = {}
+        for index, instruction in enumerate(self.program.instructions):
+            if not self.instruction_counts[index]:
+                continue
+            count, seconds = opcodes.get(instruction.opcode.name, (0, 0.0))
+            opcodes[instruction.opcode.name] = (count + self.instruction_counts[index], seconds + self.instruction_seconds[index])
+        return opcodes
+
+    def format_report(self, limit: Optional[int] = None) -> str:
+        executed = sum(self.instruction_counts)
+        measured = sum(self.instruction_seconds) or 1.0
+        report = [f'Profile: {executed} instructions in {self.total_seconds:.6f}s', '', 'Lines by total time:',
+                  f'{"Line":>8} {"Count":>12} {"Total (s)":>12} {"Per exec (us)":>14} {"%":>6}  Source']
+        lines = sorted(self.line_statistics().items(), key=lambda item: item[1][1], reverse=True)
+        for line_number, (count, seconds) in lines[:limit]:
+            source = self.source_lines[line_number - 1] if self.source_lines and line_number <= len(self.source_lines) else ''
+            report.append(f'{line_number:>8} {count:>12} {seconds:>12.6f} {seconds / count * 1e6:>14.3f} {seconds / measured * 100:>6.1f}  {source}')
+        report += ['', 'Opcodes by total time:', f'{"Opcode":>18} {"Count":>12} {"Total (s)":>12} {"Per exec (us)":>14} {"%":>6}']
+        for opcode_name, (count, seconds) in sorted(self.opcode_statistics().items(), key=lambda item: item[1][1], reverse=True):
+            report.append(f'{opcode_name:>18} {count:>12} {seconds:>12.6f} {seconds / count * 1e6:>14.3f} {seconds / measured * 100:>6.1f}')
+        if self.label_calls:
+            report += ['', 'Subroutines by inclusive time:', f'{"Label":>18} {"Calls":>12} {"Inclusive (s)":>14}']
+            for label, calls in sorted(self.label_calls.items(), key=lambda item: self.label_seconds.get(item[0], 0.0), reverse=True):
+                report.append(f'{label:>18} {calls:>12} {self.label_seconds.get(label, 0.0):>14.6f}')
+        return '\n'.join(report)
+    def collapsed_stacks(self) -> List[str]:
+        stacks = {}
+        for (stack_key, instruction_pointer), seconds in self.stack_seconds.items():
+            line_number = self.program.instructions[instruction_pointer].position.line()
+            stack = ';'.join(stack_key + (f'line {line_number}',))
+            stacks[stack] = stacks.get(stack, 0.0) + seconds
+        return [f'{stack} {round(seconds * 1e6)}' for stack, seconds in sorted(stacks.items()) if round(seconds * 1e6) > 0]
+    def write_collapsed_stacks(self, path: str):
+        with open(path, 'w') as stacks_file:
+            for line in self.collapsed_stacks():
+                stacks_file.write(line + '\n')
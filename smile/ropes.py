@@ -0,0 +1,44 @@
+from typing import Any
+
+ROPE_THRESHOLD = 256
+
+class StringRope:
+    __slots__ = ('_chunks', '_length')
+
+    def __init__(self, *chunks: str):
+        self._chunks = list(chunks)
+        self._length = sum(len(chunk) for chunk in chunks)
+
+    def append(self, text: str) -> 'StringRope':
+        self._chunks.append(text)
+        self._length += len(text)
+        return self
+    def text(self) -> str:
+        if len(self._chunks) != 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0]
+    def __len__(self) -> int:
+        return self._length
+    def __str__(self) -> str:
+        return self.text()
+    def __repr__(self) -> str:
+        return repr(self.text())
+
+def plain_value(value: Any) -> Any:
+    if type(value) is StringRope:
+        return value.text()
+    return value
+
+def concatenate(left: str, right: str):
+    if len(left) + len(right) < ROPE_THRESHOLD:
+        return left + right
+    return StringRope(left, right)
+
+def append_text(rope: StringRope, text: str) -> StringRope:
+    return rope.append(text)
+
+def append_rope(rope: StringRope, other: StringRope) -> StringRope:
+    return rope.append(other.text())
+
+def prepend_text(text: str, rope: StringRope) -> StringRope:
+    return StringRope(text, rope.text())
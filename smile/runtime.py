@@ -1,254 +1,242 @@
-from typing import List, Any, Tuple, Optional
-from .tokens import SmileToken, SmileTokenType
-from .state import ProgramState
-import sys
+from typing import Any
+import operator
+from .exceptions import SmileRuntimeException
+from .opcodes import Opcode
+from .ropes import StringRope, concatenate, append_text, append_rope, prepend_text
 
 class VariableManager:
     @classmethod
-    def assign_value(cls, instruction: List[SmileToken]):
-        var_name = None
-        var_value = None
-        for token in instruction:
-            if token.kind() == SmileTokenType.VARIABLE_NAME:
-                var_name = token.text()
-            elif token.kind() in [SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA]:
-                var_value = token.value()
-            elif token.kind() == SmileTokenType.STRING_DATA:
-                var_value = token.value()
-        if var_name and var_value is not None:
-            ProgramState.variable_storage[var_name] = var_value
+    def assign_value(cls, state, instruction, position: int) -> int:
+        slot, var_value = instruction.operands
+        state.frame[slot] = var_value
+        return position + 1
 
 class OutputManager:
     @classmethod
-    def display_content(cls, instruction: List[SmileToken]):
-        for token in instruction:
-            if token.kind() == SmileTokenType.VARIABLE_NAME:
-                var_name = token.text()
-                if var_name in ProgramState.variable_storage:
-                    print(ProgramState.variable_storage[var_name])
-                else:
-                    print(0)
-            elif token.kind() == SmileTokenType.STRING_DATA:
-                print(token.value())
+    def display_content(cls, state, instruction, position: int) -> int:
+        frame = state.frame
+        write_line = state.write_line
+        for slot, literal in instruction.operands:
+            if slot is None:
+                write_line(literal)
+            else:
+                value = frame[slot]
+                write_line(0 if value is None else value)
+        return position + 1
 
 class InputProcessor:
     @classmethod
-    def handle_numeric_input(cls, instruction: List[SmileToken]):
-        var_name = None
-        for token in instruction:
-            if token.kind() == SmileTokenType.VARIABLE_NAME:
-                var_name = token.text()
-                break
-        if var_name:
-            try:
-                user_input = input().strip()
-                if '.' in user_input:
-                    converted_value = float(user_input)
-                else:
-                    converted_value = int(user_input)
-                ProgramState.variable_storage[var_name] = converted_value
-            except ValueError:
-                print(f"Error: Invalid numeric input for variable {var_name}")
-                sys.exit(1)
-    @classmethod
-    def handle_text_input(cls, instruction: List[SmileToken]):
-        var_name = None
-        for token in instruction:
-            if token.kind() == SmileTokenType.VARIABLE_NAME:
-                var_name = token.text()
-                break
-        if var_name:
-            user_input = input().strip()
-            ProgramState.variable_storage[var_name] = user_input
+    def handle_numeric_input(cls, state, instruction, position: int) -> int:
+        slot, = instruction.operands
+        try:
+            user_input = state.read_line().strip()
+            if '.' in user_input:
+                converted_value = float(user_input)
+            else:
+                converted_value = int(user_input)
+            state.frame[slot] = converted_value
+        except ValueError:
+            raise SmileRuntimeException(f"Invalid numeric input for variable {state.variable_names[slot]}", instruction.position)
+        return position + 1
+    @classmethod
+    def handle_text_input(cls, state, instruction, position: int) -> int:
+        slot, = instruction.operands
+        user_input = state.read_line().strip()
+        state.frame[slot] = user_input
+        return position + 1
+
+def _repeat_text(text: str, count: int) -> str:
+    if count < 0:
+        ArithmeticEngine._report_invalid_operation(Opcode.MULT)
+    return text * count
+
+def _repeat_count(count: int, text: str) -> str:
+    if count < 0:
+        ArithmeticEngine._report_invalid_operation(Opcode.MULT)
+    return text * count
+
+def _repeat_rope(rope: StringRope, count: int) -> str:
+    return _repeat_text(rope.text(), count)
+
+def _repeat_count_rope(count: int, rope: StringRope) -> str:
+    return _repeat_count(count, rope.text())
+
+def _floor_divide(dividend: int, divisor: int) -> int:
+    if divisor == 0:
+        ArithmeticEngine._report_invalid_operation(Opcode.DIV)
+    return dividend // divisor
+
+def _true_divide(dividend: Any, divisor: Any) -> float:
+    if divisor == 0:
+        ArithmeticEngine._report_invalid_operation(Opcode.DIV)
+    return dividend / divisor
+
+_NUMERIC_PAIRS = ((int, int), (int, float), (float, int), (float, float))
 
 class ArithmeticEngine:
+    UNSPECIALIZED = (None, None, None)
+    _OPERATION_NAMES = {
+        Opcode.ADD: 'addition',
+        Opcode.SUB: 'subtraction',
+        Opcode.MULT: 'multiplication',
+        Opcode.DIV: 'division'
+    }
+    _KERNELS = {
+        Opcode.ADD: dict([(pair, operator.add) for pair in _NUMERIC_PAIRS] + [((str, str), operator.add)]),
+        Opcode.SUB: dict((pair, operator.sub) for pair in _NUMERIC_PAIRS),
+        Opcode.MULT: dict([(pair, operator.mul) for pair in _NUMERIC_PAIRS] + [((str, int), _repeat_text), ((int, str), _repeat_count)]),
+        Opcode.DIV: dict([((int, int), _floor_divide)] + [(pair, _true_divide) for pair in _NUMERIC_PAIRS[1:]])
+    }
+    _RUNTIME_KERNELS = {
+        Opcode.ADD: dict(list(_KERNELS[Opcode.ADD].items()) + [((str, str), concatenate), ((StringRope, str), append_text), ((StringRope, StringRope), append_rope), ((str, StringRope), prepend_text)]),
+        Opcode.SUB: _KERNELS[Opcode.SUB],
+        Opcode.MULT: dict(list(_KERNELS[Opcode.MULT].items()) + [((StringRope, int), _repeat_rope), ((int, StringRope), _repeat_count_rope)]),
+        Opcode.DIV: _KERNELS[Opcode.DIV]
+    }
+
     @classmethod
-    def perform_addition(cls, instruction: List[SmileToken]):
-        var_name, operand = cls._extract_operation_components(instruction)
-        if var_name and operand is not None:
-            cls._execute_arithmetic_operation(var_name, operand, 'addition')
-    @classmethod
-    def perform_subtraction(cls, instruction: List[SmileToken]):
-        var_name, operand = cls._extract_operation_components(instruction)
-        if var_name and operand is not None:
-            cls._execute_arithmetic_operation(var_name, operand, 'subtraction')
-    @classmethod
-    def perform_multiplication(cls, instruction: List[SmileToken]):
-        var_name, operand = cls._extract_operation_components(instruction)
-        if var_name and operand is not None:
-            cls._execute_arithmetic_operation(var_name, operand, 'multiplication')
-    @classmethod
-    def perform_division(cls, instruction: List[SmileToken]):
-        var_name, operand = cls._extract_operation_components(instruction)
-        if var_name and operand is not None:
-            cls._execute_arithmetic_operation(var_name, operand, 'division')
-    @classmethod
-    def _extract_operation_components(cls, instruction: List[SmileToken]) -> Tuple[Optional[str], Optional[Any]]:
-        if len(instruction) < 3:
-            print("Error: Invalid operation format")
-            sys.exit(1)
-        var_name = None
-        operand = None
-        if instruction[1].kind() == SmileTokenType.VARIABLE_NAME:
-            var_name = instruction[1].text()
-        if instruction[2].kind() in [SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA, SmileTokenType.STRING_DATA]:
-            operand = instruction[2].value()
-        elif instruction[2].kind() == SmileTokenType.VARIABLE_NAME:
-            operand = ProgramState.variable_storage.get(instruction[2].text())
-        return var_name, operand
-    @classmethod
-    def _execute_arithmetic_operation(cls, var_name: str, operand: Any, operation: str):
-        current_value = ProgramState.variable_storage.get(var_name)
+    def perform_operation(cls, state, instruction, position: int) -> int:
+        frame = state.frame
+        slot, operand_slot, literal = instruction.operands
+        current_value = frame[slot]
+        operand = literal if operand_slot is None else frame[operand_slot]
+        left_type, right_type, kernel = instruction.cache
+        if type(current_value) is left_type and type(operand) is right_type:
+            frame[slot] = kernel(current_value, operand)
+        else:
+            cls._execute_generic_operation(state, instruction, current_value, operand)
+        return position + 1
+    @classmethod
+    def _execute_generic_operation(cls, state, instruction, current_value: Any, operand: Any):
+        if operand is None:
+            return
+        slot = instruction.operands[0]
         if current_value is None:
-            print(f"Error: Variable {var_name} not defined")
-            sys.exit(1)
-        result = None
-        if operation == 'addition':
-            if isinstance(current_value, str) and isinstance(operand, str):
-                result = current_value + operand
-            elif isinstance(current_value, (int, float)) and isinstance(operand, (int, float)):
-                result = current_value + operand
-            else:
-                print("Error: Invalid addition operation")
-                sys.exit(1)
-        elif operation == 'subtraction':
-            if isinstance(current_value, (int, float)) and isinstance(operand, (int, float)):
-                result = current_value - operand
-            else:
-                print("Error: Invalid subtraction operation")
-                sys.exit(1)
-        elif operation == 'multiplication':
-            if isinstance(current_value, str) and isinstance(operand, int) and operand >= 0:
-                result = current_value * operand
-            elif isinstance(current_value, int) and isinstance(operand, str) and current_value >= 0:
-                result = operand * current_value
-            elif isinstance(current_value, (int, float)) and isinstance(operand, (int, float)):
-                result = current_value * operand
-            else:
-                print("Error: Invalid multiplication operation")
-                sys.exit(1)
-        elif operation == 'division':
-            if isinstance(current_value, int) and isinstance(operand, int) and operand != 0:
-                result = current_value // operand
-            elif isinstance(current_value, (int, float)) and isinstance(operand, (int, float)) and operand != 0:
-                result = current_value / operand
-            else:
-                print("Error: Invalid division operation")
-                sys.exit(1)
-        ProgramState.variable_storage[var_name] = result
+            raise SmileRuntimeException(f"Variable {state.variable_names[slot]} not defined", instruction.position)
+        type_pair = (type(current_value), type(operand))
+        kernel = cls._RUNTIME_KERNELS[instruction.opcode].get(type_pair)
+        if kernel is None:
+            cls._report_invalid_operation(instruction.opcode)
+        instruction.cache = type_pair + (kernel,)
+        state.frame[slot] = kernel(current_value, operand)
+    @classmethod
+    def _report_invalid_operation(cls, opcode: Opcode):
+        raise SmileRuntimeException(f"Invalid {cls._OPERATION_NAMES[opcode]} operation")
 
 class FlowController:
+    _COMPARISONS = {
+        '=': operator.eq,
+        '<>': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge
+    }
+
     @classmethod
-    def execute_jump(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int) -> int:
-        if len(instruction) == 2:
-            return cls._execute_simple_jump(instruction, all_instructions, current_position)
-        elif len(instruction) == 6:
-            return cls._execute_conditional_jump(instruction, all_instructions, current_position)
-        else:
-            print("Error: Invalid jump format")
-            sys.exit(1)
-    @classmethod
-    def execute_subroutine_call(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int, call_stack: List[int]) -> Tuple[int, List[int]]:
-        if len(instruction) == 2:
-            return cls._execute_simple_subroutine_call(instruction, all_instructions, current_position, call_stack)
-        elif len(instruction) == 6:
-            return cls._execute_conditional_subroutine_call(instruction, all_instructions, current_position, call_stack)
-        else:
-            print("Error: Invalid subroutine call format")
-            sys.exit(1)
-    @classmethod
-    def execute_subroutine_return(cls, call_stack: List[int]) -> int:
-        if not call_stack:
-            print("Error: RETURN without matching subroutine call")
-            sys.exit(1)
-        return call_stack.pop()
-    @classmethod
-    def _execute_simple_jump(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int) -> int:
-        target = cls._extract_jump_target(instruction)
-        return cls._resolve_jump_target(target, all_instructions, current_position)
-    @classmethod
-    def _execute_conditional_jump(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int) -> int:
-        condition_met = cls._evaluate_condition(instruction[2:])
-        if condition_met:
-            return cls._execute_simple_jump(instruction[:2], all_instructions, current_position)
-        return current_position + 1
-    @classmethod
-    def _execute_simple_subroutine_call(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int, call_stack: List[int]) -> Tuple[int, List[int]]:
-        target = cls._extract_jump_target(instruction)
-        target_position = cls._resolve_jump_target(target, all_instructions, current_position)
-        call_stack.append(current_position + 1)
-        return target_position, call_stack
-    @classmethod
-    def _execute_conditional_subroutine_call(cls, instruction: List[SmileToken], all_instructions: List[List[SmileToken]], current_position: int, call_stack: List[int]) -> Tuple[int, List[int]]:
-        condition_met = cls._evaluate_condition(instruction[2:])
-        if condition_met:
-            return cls._execute_simple_subroutine_call(instruction[:2], all_instructions, current_position, call_stack)
-        return current_position + 1, call_stack
-    @classmethod
-    def _extract_jump_target(cls, instruction: List[SmileToken]) -> str:
-        for token in instruction:
-            if token.kind() in [SmileTokenType.INTEGER_DATA, SmileTokenType.STRING_DATA]:
-                return token.text()
-        print("Error: Jump target not specified")
-        sys.exit(1)
-    @classmethod
-    def _resolve_jump_target(cls, target: str, all_instructions: List[List[SmileToken]], current_position: int) -> int:
-        if target.isdigit() or (target.startswith('-') and target[1:].isdigit()):
-            offset = int(target)
-            if offset == 0:
-                print("Error: Jump offset of 0 causes infinite loop")
-                sys.exit(1)
-            target_position = current_position + offset
-            if 0 <= target_position < len(all_instructions):
-                return target_position
-            else:
-                print(f"Error: Jump target position {target_position} out of range")
-                sys.exit(1)
-        elif target.startswith('"') and target.endswith('"'):
-            label_name = target[1:-1]
-            if label_name in ProgramState.label_registry:
-                label_position = ProgramState.label_registry[label_name]
-                if 0 <= label_position - 1 < len(all_instructions):
-                    return label_position - 1
-                else:
-                    print(f"Error: Label position {label_position} out of range")
-                    sys.exit(1)
-            else:
-                print(f"Error: Label '{label_name}' not found")
-                sys.exit(1)
-        else:
-            print(f"Error: Invalid jump target '{target}'")
-            sys.exit(1)
-    @classmethod
-    def _evaluate_condition(cls, condition_tokens: List[SmileToken]) -> bool:
-        if len(condition_tokens) != 4:
-            print("Error: Invalid conditional expression")
-            sys.exit(1)
-        left_operand = cls._get_operand_value(condition_tokens[0])
-        operator = condition_tokens[1].text()
-        right_operand = cls._get_operand_value(condition_tokens[2])
+    def execute_jump(cls, state, instruction, position: int) -> int:
+        target, condition = instruction.operands
+        if condition is not None and not cls._evaluate_condition(state, instruction, condition):
+            return position + 1
+        if target is None:
+            cls._report_missing_target(instruction)
+        return target
+    @classmethod
+    def execute_subroutine_call(cls, state, instruction, position: int) -> int:
+        target, condition = instruction.operands
+        if condition is not None and not cls._evaluate_condition(state, instruction, condition):
+            return position + 1
+        if target is None:
+            cls._report_missing_target(instruction)
+        state.call_stack.append(position + 1)
+        return target
+    @classmethod
+    def execute_tail_call(cls, state, instruction, position: int) -> int:
+        target, condition = instruction.operands
+        if condition is not None and not cls._evaluate_condition(state, instruction, condition):
+            return position + 1
+        if target is None:
+            cls._report_missing_target(instruction)
+        if not state.call_stack:
+            state.call_stack.append(position + 1)
+        return target
+    @classmethod
+    def execute_subroutine_return(cls, state, instruction, position: int) -> int:
+        if not state.call_stack:
+            raise SmileRuntimeException("RETURN without matching subroutine call", instruction.position)
+        return state.call_stack.pop()
+    @classmethod
+    def execute_termination(cls, state, instruction, position: int) -> int:
+        return len(state.instructions)
+    @classmethod
+    def execute_sequence(cls, state, instruction, position: int) -> int:
+        next_position = position + 1
+        for step in instruction.operands:
+            next_position = step.handler(state, step, position)
+        return next_position
+    @classmethod
+    def skip_instruction(cls, state, instruction, position: int) -> int:
+        return position + 1
+    @classmethod
+    def report_failure(cls, state, instruction, position: int) -> int:
+        message, = instruction.operands
+        raise SmileRuntimeException(message, instruction.position)
+    @classmethod
+    def _report_missing_target(cls, instruction):
+        raise SmileRuntimeException("Jump target not specified", instruction.position)
+    @classmethod
+    def _evaluate_condition(cls, state, instruction, condition) -> bool:
+        left_slot, left_literal, operator_text, right_slot, right_literal = condition
+        frame = state.frame
+        left_operand = left_literal if left_slot is None else frame[left_slot]
+        right_operand = right_literal if right_slot is None else frame[right_slot]
         if left_operand is None or right_operand is None:
-            print("Error: Undefined variable in condition")
-            sys.exit(1)
-        if operator == '=':
-            return left_operand == right_operand
-        elif operator == '<>':
-            return left_operand != right_operand
-        elif operator == '<':
-            return left_operand < right_operand
-        elif operator == '<=':
-            return left_operand <= right_operand
-        elif operator == '>':
-            return left_operand > right_operand
-        elif operator == '>=':
-            return left_operand >= right_operand
-        else:
-            print(f"Error: Unknown comparison operator '{operator}'")
-            sys.exit(1)
-    @classmethod
-    def _get_operand_value(cls, token: SmileToken) -> Any:
-        if token.kind() in [SmileTokenType.INTEGER_DATA, SmileTokenType.FLOAT_DATA]:
-            return token.value()
-        elif token.kind() == SmileTokenType.VARIABLE_NAME:
-            return ProgramState.variable_storage.get(token.text())
-        return None 
\ No newline at end of file
+            raise SmileRuntimeException("Undefined variable in condition", instruction.position)
+        if type(left_operand) is StringRope:
+            left_operand = left_operand.text()
+        if type(right_operand) is StringRope:
+            right_operand = right_operand.text()
+        comparison = cls._COMPARISONS.get(operator_text)
+        if comparison is None:
+            raise SmileRuntimeException(f"Unknown comparison operator '{operator_text}'", instruction.position)
+        try:
+            return comparison(left_operand, right_operand)
+        except TypeError:
+            raise SmileRuntimeException("Invalid comparison", instruction.position) from None
+
+class FusedOperations:
+    @classmethod
+    def execute_arithmetic_jump(cls, state, instruction, position: int) -> int:
+        arithmetic, jump = instruction.operands
+        frame = state.frame
+        slot, operand_slot, literal = arithmetic.operands
+        current_value = frame[slot]
+        operand = literal if operand_slot is None else frame[operand_slot]
+        left_type, right_type, kernel = arithmetic.cache
+        try:
+            if type(current_value) is left_type and type(operand) is right_type:
+                frame[slot] = kernel(current_value, operand)
+            else:
+                ArithmeticEngine._execute_generic_operation(state, arithmetic, current_value, operand)
+        except SmileRuntimeException as runtime_error:
+            cls._locate(runtime_error, arithmetic)
+        target, condition = jump.operands
+        if not FlowController._evaluate_condition(state, jump, condition):
+            return position + 1
+        if target is None:
+            FlowController._report_missing_target(jump)
+        return target
+    @classmethod
+    def execute_assign_arithmetic(cls, state, instruction, position: int) -> int:
+        assignment, arithmetic = instruction.operands
+        try:
+            VariableManager.assign_value(state, assignment, position)
+            ArithmeticEngine.perform_operation(state, arithmetic, position)
+        except SmileRuntimeException as runtime_error:
+            cls._locate(runtime_error, arithmetic)
+        return position + 1
+    @classmethod
+    def _locate(cls, runtime_error: SmileRuntimeException, instruction):
+        if runtime_error.location() is None:
+            raise SmileRuntimeException(runtime_error.message(), instruction.position) from None
+        raise runtime_error
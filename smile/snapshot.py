@@ -0,0 +1,205 @@
+import hashlib
+import marshal
+import os
+import signal
+import tempfile
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+from .compiler import CompiledProgram, Instruction
+from .exceptions import SmileSnapshotException
+from .opcodes import Opcode, COMPOUND_OPCODES
+from .ropes import plain_value
+from .tokens import CodePosition
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b'SMSN'
+
+def _describe_instruction(instruction: Instruction) -> Tuple:
+    operands = instruction.operands
+    if instruction.opcode in COMPOUND_OPCODES:
+        operands = tuple(_describe_instruction(step) for step in operands)
+    return (int(instruction.opcode), operands, instruction.position.pack())
+
+def program_fingerprint(program: CompiledProgram) -> str:
+    description = (tuple(program.variable_names), tuple(sorted(program.label_registry.items())),
+                   tuple(_describe_instruction(instruction) for instruction in program.instructions))
+    return hashlib.sha256(repr(description).encode()).hexdigest()
+
+class ExecutionSnapshot(NamedTuple):
+    fingerprint: str
+    instruction_pointer: int
+    call_stack: Tuple[int, ...]
+    variables: Tuple[Tuple[str, Any], ...]
+    label_registry: Tuple[Tuple[str, int], ...]
+    input_position: int
+
+    @classmethod
+    def capture(cls, state, fingerprint: str) -> 'ExecutionSnapshot':
+        variables = tuple((name, plain_value(value)) for name, value in zip(state.variable_names, state.frame) if value is not None)
+        return cls(fingerprint, state.instruction_pointer, tuple(state.call_stack), variables,
+                   tuple(state.label_registry.items()), state.input_source.position())
+    def restore(self, state, fingerprint: str):
+        if self.fingerprint != fingerprint:
+            raise SmileSnapshotException('snapshot was taken from a different program')
+        if not 0 <= self.instruction_pointer <= len(state.instructions):
+            raise SmileSnapshotException(f'instruction pointer {self.instruction_pointer} out of range')
+        slots = {name: slot for slot, name in enumerate(state.variable_names)}
+        frame = [None] * len(state.variable_names)
+        for name, value in self.variables:
+            if name not in slots:
+                raise SmileSnapshotException(f"variable '{name}' is not used by the program")
+            frame[slots[name]] = value
+        state.frame[:] = frame
+        state.call_stack[:] = self.call_stack
+        state.label_registry = dict(self.label_registry)
+        state.instruction_pointer = self.instruction_pointer
+        state.input_source.seek(self.input_position)
+
+    def serialize(self) -> bytes:
+        return SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION]) + marshal.dumps(tuple(self))
+    @classmethod
+    def deserialize(cls, data: bytes) -> 'ExecutionSnapshot':
+        header = len(SNAPSHOT_MAGIC)
+        if data[:header] != SNAPSHOT_MAGIC or len(data) <= header:
+            raise SmileSnapshotException('not a Smile snapshot')
+        if data[header] != SNAPSHOT_VERSION:
+            raise SmileSnapshotException(f'unsupported snapshot version {data[header]}')
+        try:
+            return cls(*marshal.loads(data[header + 1:]))
+        except (EOFError, ValueError, TypeError) as format_error:
+            raise SmileSnapshotException(f'corrupt snapshot ({format_error})') from None
+
+def write_snapshot(snapshot: ExecutionSnapshot, path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot_file:
+            snapshot_file.write(snapshot.serialize())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+def read_snapshot(path: str) -> ExecutionSnapshot:
+    with open(path, 'rb') as snapshot_file:
+        return ExecutionSnapshot.deserialize(snapshot_file.read())
+
+class SnapshotWriter:
+    def __init__(self, program: CompiledProgram, path: str, every_instructions: Optional[int] = None,
+                 every_seconds: Optional[float] = None, signals: Sequence[int] = (signal.SIGUSR1,),
+                 stop_signals: Sequence[int] = (signal.SIGTERM,)):
+        self.path = path
+        self.every_instructions = every_instructions
+        self.every_seconds = every_seconds
+        self.signals = tuple(signals)
+        self.stop_signals = tuple(stop_signals)
+        self.fingerprint = program_fingerprint(program)
+        self.snapshots_written = 0
+        self.write_seconds = 0.0
+        self._state = None
+        self._originals = None
+        self._traps = None
+        self._stop_signal = None
+        self._stopped_at = None
+
+    def request(self, signal_number: Optional[int] = None, frame=None):
+        if signal_number in self.stop_signals:
+            self._stop_signal = signal_number
+        if self._traps is not None:
+            self._state.instructions[:] = self._traps
+    def resume(self, state, snapshot: ExecutionSnapshot):
+        snapshot.restore(state, self.fingerprint)
+    def save(self, state):
+        started = time.perf_counter()
+        state.output.flush()
+        write_snapshot(ExecutionSnapshot.capture(state, self.fingerprint), self.path)
+        self.snapshots_written += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def execute(self, state):
+        self._state = state
+        state.instructions = list(state.instructions)
+        self._originals = list(state.instructions)
+        trap = Instruction(Opcode.NOP, (), CodePosition(1, 1))
+        trap.handler = self._trap
+        self._traps = [trap] * len(self._originals)
+        previous_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signal_number in self.signals + self.stop_signals:
+                previous_handlers[signal_number] = signal.signal(signal_number, self.request)
+        stop_ticking = threading.Event()
+        ticker = None
+        if self.every_seconds is not None:
+            ticker = threading.Thread(target=self._tick, args=(stop_ticking,), daemon=True)
+            ticker.start()
+        try:
+            if self.every_instructions is None:
+                self._execute(state)
+            else:
+                self._execute_counted(state)
+            if self._stopped_at is None:
+                self.save(state)
+        finally:
+            stop_ticking.set()
+            if ticker is not None:
+                ticker.join()
+            self._traps = None
+            state.instructions[:] = self._originals
+            for signal_number, handler in previous_handlers.items():
+                signal.signal(signal_number, handler)
+        if self._stopped_at is not None:
+            state.instruction_pointer = self._stopped_at
+            os.kill(os.getpid(), self._stop_signal)
+    def _tick(self, stop_ticking: threading.Event):
+        while not stop_ticking.wait(self.every_seconds):
+            self.request()
+    def _trap(self, state, instruction: Instruction, position: int) -> int:
+        state.instructions[:] = self._originals
+        state.instruction_pointer = position
+        self.save(state)
+        if self._stop_signal is not None:
+            self._stopped_at = position
+            return len(state.instructions)
+        original = self._originals[position]
+        return original.handler(state, original, position)
+
+    def _execute(self, state):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        instruction_pointer = state.instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                instruction = instructions[instruction_pointer]
+                instruction_pointer = instruction.handler(state, instruction, instruction_pointer)
+        finally:
+            state.instruction_pointer = instruction_pointer
+    def _execute_counted(self, state):
+        instructions = state.instructions
+        instruction_count = len(instructions)
+        every_instructions = self.every_instructions
+        executed = 0
+        next_save = every_instructions
+        instruction_pointer = state.instruction_pointer
+        block_start = instruction_pointer
+        try:
+            while instruction_pointer < instruction_count:
+                instruction = instructions[instruction_pointer]
+                next_pointer = instruction.handler(state, instruction, instruction_pointer)
+                if next_pointer != instruction_pointer + 1:
+                    executed += instruction_pointer + 1 - block_start
+                    block_start = next_pointer
+                    if executed >= next_save and self._stopped_at is None:
+                        state.instruction_pointer = next_pointer
+                        self.save(state)
+                        next_save = executed + every_instructions
+                instruction_pointer = next_pointer
+        finally:
+            state.instruction_pointer = instruction_pointer
+
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'snapshots_written': self.snapshots_written,
+            'write_seconds': self.write_seconds
+        }
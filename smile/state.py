@@ -1,9 +1,18 @@
-import sys
+from typing import Any, Dict
+from .ropes import plain_value
 
 class ProgramState:
-    variable_storage = {}
-    label_registry = {}
+    def __init__(self, program, input_source, output):
+        self.instructions = program.instructions
+        self.variable_names = program.variable_names
+        self.label_registry = program.label_registry
+        self.frame = [None] * len(program.variable_names)
+        self.call_stack = []
+        self.instruction_pointer = 0
+        self.input_source = input_source
+        self.read_line = input_source.read_line
+        self.output = output
+        self.write_line = output.write_line
 
-    @classmethod
-    def terminate_execution(cls):
-        sys.exit(0) 
\ No newline at end of file
+    def variables(self) -> Dict[str, Any]:
+        return {name: plain_value(value) for name, value in zip(self.variable_names, self.frame) if value is not None}
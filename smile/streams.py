@@ -0,0 +1,110 @@
+import sys
+from typing import Any, List, Optional, TextIO, Union
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+class OutputSink:
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._buffer = []
+        self._buffered = 0
+        self._buffer_size = buffer_size
+    def write_line(self, value: Any):
+        text = f'{value}\n'
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+    def flush(self):
+        if self._buffer:
+            self._write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+    def close(self):
+        self.flush()
+    def _write(self, text: str):
+        raise NotImplementedError
+
+class StdoutSink(OutputSink):
+    def __init__(self, buffer_size: Optional[int] = None):
+        if buffer_size is None:
+            buffer_size = 0 if sys.stdout.isatty() else DEFAULT_BUFFER_SIZE
+        super().__init__(buffer_size)
+    def flush(self):
+        super().flush()
+        sys.stdout.flush()
+    def _write(self, text: str):
+        sys.stdout.write(text)
+
+class MemorySink(OutputSink):
+    def __init__(self):
+        super().__init__(0)
+        self._chunks = []
+    def write_line(self, value: Any):
+        self._chunks.append(f'{value}\n')
+    def getvalue(self) -> str:
+        return ''.join(self._chunks)
+    def lines(self) -> List[str]:
+        return [chunk[:-1] for chunk in self._chunks]
+
+class FileSink(OutputSink):
+    def __init__(self, target: Union[str, int], buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(buffer_size)
+        if isinstance(target, int):
+            self._file = open(target, 'w', closefd=False)
+        else:
+            self._file = open(target, 'w')
+    def flush(self):
+        super().flush()
+        self._file.flush()
+    def close(self):
+        self.flush()
+        self._file.close()
+    def _write(self, text: str):
+        self._file.write(text)
+
+class InputProvider:
+    def read_line(self) -> str:
+        raise NotImplementedError
+    def position(self) -> int:
+        raise NotImplementedError
+    def seek(self, position: int):
+        while self.position() < position:
+            self.read_line()
+
+class ConsoleInput(InputProvider):
+    def __init__(self):
+        self._consumed = 0
+    def read_line(self) -> str:
+        line = input()
+        self._consumed += 1
+        return line
+    def position(self) -> int:
+        return self._consumed
+
+class BufferedInput(InputProvider):
+    def __init__(self, lines: List[str]):
+        self._lines = lines
+        self._index = 0
+    @classmethod
+    def from_text(cls, text: str) -> 'BufferedInput':
+        lines = text.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        return cls(lines)
+    @classmethod
+    def from_stream(cls, stream: TextIO) -> 'BufferedInput':
+        return cls.from_text(stream.read())
+    @classmethod
+    def from_file(cls, path: str) -> 'BufferedInput':
+        with open(path) as input_file:
+            return cls.from_stream(input_file)
+    def read_line(self) -> str:
+        index = self._index
+        if index >= len(self._lines):
+            raise EOFError('EOF when reading a line')
+        self._index = index + 1
+        return self._lines[index]
+    def position(self) -> int:
+        return self._index
+    def seek(self, position: int):
+        self._index = position
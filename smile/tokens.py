@@ -1,5 +1,7 @@
+import marshal
+from array import array
 from enum import Enum
-from typing import Any
+from typing import Any, Iterable, Iterator, List, Optional
 
 class SmileTokenCategory(Enum):
     COMPARISON = 1
@@ -45,7 +47,18 @@ class SmileTokenType(Enum):
     def category(self) -> SmileTokenCategory:
         return self._category
 
+_COLUMN_BITS = 32
+_COLUMN_MASK = (1 << _COLUMN_BITS) - 1
+
+def pack_position(line: int, column: int) -> int:
+    return (line << _COLUMN_BITS) | column
+
+def relocate_position(packed: int, line: int) -> int:
+    return pack_position(line, packed & _COLUMN_MASK)
+
 class CodePosition:
+    __slots__ = ('_line', '_column')
+
     def __init__(self, line: int, column: int):
         if line < 1:
             raise ValueError(f'Line number must be positive, got {line}')
@@ -53,6 +66,11 @@ class CodePosition:
             raise ValueError(f'Column number must be positive, got {column}')
         self._line = line
         self._column = column
+    @classmethod
+    def unpack(cls, packed: int) -> 'CodePosition':
+        return cls(packed >> _COLUMN_BITS, packed & _COLUMN_MASK)
+    def pack(self) -> int:
+        return pack_position(self._line, self._column)
     def line(self) -> int:
         return self._line
     def column(self) -> int:
@@ -64,19 +82,128 @@ class CodePosition:
     def __eq__(self, other):
         return (isinstance(other, CodePosition) and self._line == other._line and self._column == other._column)
 
-class SmileToken:
-    def __init__(self, token_type: SmileTokenType, text: str, position: CodePosition, value: Any = None):
-        self._type = token_type
-        self._text = text
-        self._position = position
-        self._value = value
+class SmileToken(tuple):
+    __slots__ = ()
+
+    def __new__(cls, token_type: SmileTokenType, text: str, position: CodePosition, value: Any = None):
+        return tuple.__new__(cls, (token_type, text, position.pack(), value))
+    def __getnewargs__(self):
+        return (self[0], self[1], self.location(), self[3])
     def kind(self) -> SmileTokenType:
-        return self._type
+        return self[0]
     def text(self) -> str:
-        return self._text
+        return self[1]
     def location(self) -> CodePosition:
-        return self._position
+        return CodePosition.unpack(self[2])
+    def packed_location(self) -> int:
+        return self[2]
     def value(self) -> Any:
-        return self._value
+        return self[3]
+    def __repr__(self) -> str:
+        return f'SmileToken({self[0].name}, {self[1]!r}, {self.location()!r}, {self[3]!r})'
     def __eq__(self, other):
-        return (isinstance(other, SmileToken) and self._type == other._type and self._text == other._text and self._position == other._position and self._value == other._value) 
\ No newline at end of file
+        return (isinstance(other, SmileToken) and tuple.__eq__(self, other))
+    def __ne__(self, other):
+        return not self == other
+    __hash__ = None
+
+_TOKEN_TYPES = [None] * (max(token_type.index() for token_type in SmileTokenType) + 1)
+for _token_type in SmileTokenType:
+    _TOKEN_TYPES[_token_type.index()] = _token_type
+
+def _decode_value(token_type: SmileTokenType, text: str) -> Any:
+    if token_type is SmileTokenType.INTEGER_DATA:
+        return int(text)
+    elif token_type is SmileTokenType.FLOAT_DATA:
+        return float(text)
+    elif token_type is SmileTokenType.STRING_DATA:
+        return text[1:-1]
+    elif token_type is SmileTokenType.VARIABLE_NAME or token_type.category() == SmileTokenCategory.COMMAND:
+        return text
+    return None
+
+def _unquote(text: str) -> str:
+    return text[1:-1]
+
+def _value_decoder(token_type: Optional[SmileTokenType]):
+    if token_type is None:
+        return None
+    elif token_type is SmileTokenType.INTEGER_DATA:
+        return int
+    elif token_type is SmileTokenType.FLOAT_DATA:
+        return float
+    elif token_type is SmileTokenType.STRING_DATA:
+        return _unquote
+    elif token_type is SmileTokenType.VARIABLE_NAME or token_type.category() == SmileTokenCategory.COMMAND:
+        return str
+    return None
+
+_VALUE_DECODERS = [_value_decoder(token_type) for token_type in _TOKEN_TYPES]
+
+class TokenStream:
+    def __init__(self):
+        self._kinds = array('B')
+        self._positions = array('Q')
+        self._texts = []
+        self._line_ends = array('L')
+    @classmethod
+    def from_token_lines(cls, token_lines: Iterable[List[SmileToken]]) -> 'TokenStream':
+        stream = cls()
+        for tokens in token_lines:
+            stream.append_line(tokens)
+        return stream
+    def append_line(self, tokens: List[SmileToken]):
+        self._kinds.extend([token[0].index() for token in tokens])
+        self._positions.extend([token[2] for token in tokens])
+        self._texts.extend([token[1] for token in tokens])
+        self._line_ends.append(len(self._texts))
+    def __len__(self) -> int:
+        return len(self._texts)
+    def line_count(self) -> int:
+        return len(self._line_ends)
+    def kind(self, index: int) -> SmileTokenType:
+        return _TOKEN_TYPES[self._kinds[index]]
+    def text(self, index: int) -> str:
+        return self._texts[index]
+    def location(self, index: int) -> CodePosition:
+        return CodePosition.unpack(self._positions[index])
+    def value(self, index: int) -> Any:
+        return _decode_value(self.kind(index), self._texts[index])
+    def token(self, index: int) -> SmileToken:
+        token_type = self.kind(index)
+        text = self._texts[index]
+        return tuple.__new__(SmileToken, (token_type, text, self._positions[index], _decode_value(token_type, text)))
+    def line_tokens(self, line_index: int) -> List[SmileToken]:
+        start = self._line_ends[line_index - 1] if line_index > 0 else 0
+        return [self.token(index) for index in range(start, self._line_ends[line_index])]
+    def token_lines(self) -> Iterator[List[SmileToken]]:
+        kinds = self._kinds
+        positions = self._positions
+        texts = self._texts
+        start = 0
+        for end in self._line_ends:
+            tokens = []
+            for index in range(start, end):
+                kind_index = kinds[index]
+                text = texts[index]
+                decode = _VALUE_DECODERS[kind_index]
+                tokens.append(tuple.__new__(SmileToken, (_TOKEN_TYPES[kind_index], text, positions[index], None if decode is None else decode(text))))
+            yield tokens
+            start = end
+    def extend(self, other: 'TokenStream'):
+        offset = len(self._texts)
+        self._kinds.extend(other._kinds)
+        self._positions.extend(other._positions)
+        self._texts.extend(other._texts)
+        self._line_ends.extend([line_end + offset for line_end in other._line_ends])
+    def serialize(self) -> bytes:
+        return marshal.dumps((self._kinds.tobytes(), self._positions.tobytes(), tuple(self._texts), self._line_ends.tobytes()))
+    @classmethod
+    def deserialize(cls, data: bytes) -> 'TokenStream':
+        kinds, positions, texts, line_ends = marshal.loads(data)
+        stream = cls()
+        stream._kinds.frombytes(kinds)
+        stream._positions.frombytes(positions)
+        stream._texts = list(texts)
+        stream._line_ends.frombytes(line_ends)
+        return stream
@@ -0,0 +1,270 @@
+import math
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional
+from .compiler import CompiledProgram, Instruction
+from .exceptions import SmileRuntimeException
+from .opcodes import Opcode, ARITHMETIC_OPCODES, COMPOUND_OPCODES
+from .ropes import StringRope
+from .runtime import ArithmeticEngine, FlowController
+from .state import ProgramState
+from .streams import ConsoleInput, InputProvider, OutputSink, StdoutSink
+from .tokens import CodePosition
+
+TRANSPILER_VERSION = 3
+
+def _runtime_error(message: str, packed_position: int) -> SmileRuntimeException:
+    return SmileRuntimeException(message, CodePosition.unpack(packed_position))
+
+def _read_number(read_line: Callable[[], str], variable_name: str, packed_position: int):
+    user_input = read_line().strip()
+    try:
+        if '.' in user_input:
+            return float(user_input)
+        return int(user_input)
+    except ValueError:
+        raise _runtime_error(f"Invalid numeric input for variable {variable_name}", packed_position) from None
+
+def _arithmetic(opcode: Opcode, current_value: Any, operand: Any, variable_name: str, packed_position: int, packed_line_position: int):
+    if operand is None:
+        return current_value
+    if current_value is None:
+        raise _runtime_error(f"Variable {variable_name} not defined", packed_position)
+    kernel = ArithmeticEngine._KERNELS[opcode].get((type(current_value), type(operand)))
+    try:
+        if kernel is None:
+            ArithmeticEngine._report_invalid_operation(opcode)
+        return kernel(current_value, operand)
+    except SmileRuntimeException as runtime_error:
+        if runtime_error.location() is None:
+            raise _runtime_error(runtime_error.message(), packed_line_position) from None
+        raise
+
+def _compare(operator_text: str, left: Any, right: Any, packed_position: int) -> bool:
+    if type(left) is StringRope:
+        left = left.text()
+    if type(right) is StringRope:
+        right = right.text()
+    try:
+        return FlowController._COMPARISONS[operator_text](left, right)
+    except TypeError:
+        raise _runtime_error("Invalid comparison", packed_position) from None
+
+_RUNTIME_NAMESPACE = {
+    '_runtime_error': _runtime_error,
+    '_read_number': _read_number,
+    '_arithmetic': _arithmetic,
+    '_compare': _compare
+}
+
+class Transpiler:
+    _COMPARISON_OPERATORS = {
+        '=': '==',
+        '<>': '!=',
+        '<': '<',
+        '<=': '<=',
+        '>': '>',
+        '>=': '>='
+    }
+    _ARITHMETIC_OPERATORS = {
+        Opcode.ADD: '+',
+        Opcode.SUB: '-',
+        Opcode.MULT: '*',
+        Opcode.DIV: '//'
+    }
+    _FALLS_THROUGH = frozenset([Opcode.NOP, Opcode.LET, Opcode.PRINT, Opcode.INNUM, Opcode.INSTR, Opcode.ADD, Opcode.SUB, Opcode.MULT, Opcode.DIV])
+
+    @classmethod
+    def transpile(cls, program: CompiledProgram) -> str:
+        instructions = program.instructions
+        variable_count = len(program.variable_names)
+        leaders = cls._find_leaders(instructions)
+        local_names = ', '.join(f'v{slot}' for slot in range(variable_count))
+        lines = [
+            'def run_program(state):',
+            '    frame = state.frame',
+            '    write_line = state.write_line',
+            '    read_line = state.read_line',
+            '    call_stack = state.call_stack',
+            '    block = state.instruction_pointer'
+        ]
+        if variable_count:
+            lines.append(f'    {local_names}, = frame')
+        lines.append('    try:')
+        lines.append(f'        while block < {len(instructions)}:')
+        cls._emit_dispatch(lines, program, leaders, 0, len(leaders), 3)
+        lines.append('    finally:')
+        if variable_count:
+            lines.append(f'        frame[:] = ({local_names},)')
+        lines.append('        state.instruction_pointer = block')
+        return '\n'.join(lines) + '\n'
+    @classmethod
+    def _find_leaders(cls, instructions: List[Instruction]) -> List[int]:
+        leaders = {0}
+        for index, instruction in enumerate(instructions):
+            final_step = cls._final_step(instruction)
+            if final_step.opcode in cls._FALLS_THROUGH:
+                continue
+            leaders.add(index + 1)
+            if final_step.opcode in (Opcode.GOTO, Opcode.GOSUB, Opcode.TAIL_CALL) and final_step.operands[0] is not None:
+                leaders.add(final_step.operands[0])
+        return sorted(leader for leader in leaders if leader < len(instructions))
+    @classmethod
+    def _final_step(cls, instruction: Instruction) -> Instruction:
+        if instruction.opcode in COMPOUND_OPCODES:
+            return instruction.operands[-1]
+        return instruction
+    @classmethod
+    def _emit_dispatch(cls, lines: List[str], program: CompiledProgram, leaders: List[int], low: int, high: int, depth: int):
+        indent = '    ' * depth
+        if high - low == 1:
+            block_end = leaders[low + 1] if low + 1 < len(leaders) else len(program.instructions)
+            cls._emit_block(lines, program, leaders[low], block_end, depth)
+            return
+        middle = (low + high) // 2
+        lines.append(f'{indent}if block < {leaders[middle]}:')
+        cls._emit_dispatch(lines, program, leaders, low, middle, depth + 1)
+        lines.append(f'{indent}else:')
+        cls._emit_dispatch(lines, program, leaders, middle, high, depth + 1)
+    @classmethod
+    def _emit_block(cls, lines: List[str], program: CompiledProgram, start: int, end: int, depth: int):
+        indent = '    ' * depth
+        for index in range(start, end):
+            instruction = program.instructions[index]
+            if instruction.opcode == Opcode.SEQUENCE:
+                for step in instruction.operands:
+                    cls._emit_step(lines, program, step, index, instruction.position.pack(), indent)
+            elif instruction.opcode in COMPOUND_OPCODES:
+                for step in instruction.operands:
+                    cls._emit_step(lines, program, step, index, step.position.pack(), indent)
+            else:
+                cls._emit_step(lines, program, instruction, index, instruction.position.pack(), indent)
+        final_step = cls._final_step(program.instructions[end - 1])
+        if final_step.opcode not in (Opcode.END, Opcode.RETURN, Opcode.FAIL) and not (final_step.opcode == Opcode.GOTO and final_step.operands[1] is None):
+            lines.append(f'{indent}block = {end}')
+            lines.append(f'{indent}continue')
+    @classmethod
+    def _emit_step(cls, lines: List[str], program: CompiledProgram, step: Instruction, index: int, packed_line_position: int, indent: str):
+        opcode = step.opcode
+        packed_position = step.position.pack()
+        if opcode == Opcode.LET:
+            slot, var_value = step.operands
+            lines.append(f'{indent}v{slot} = {cls._literal(var_value)}')
+        elif opcode == Opcode.PRINT:
+            for slot, literal in step.operands:
+                if slot is None:
+                    lines.append(f'{indent}write_line({cls._literal(literal)})')
+                else:
+                    lines.append(f'{indent}write_line(0 if v{slot} is None else v{slot})')
+        elif opcode == Opcode.INNUM:
+            slot, = step.operands
+            lines.append(f'{indent}v{slot} = _read_number(read_line, {program.variable_names[slot]!r}, {packed_position})')
+        elif opcode == Opcode.INSTR:
+            slot, = step.operands
+            lines.append(f'{indent}v{slot} = read_line().strip()')
+        elif opcode in ARITHMETIC_OPCODES:
+            cls._emit_arithmetic(lines, program, step, packed_position, packed_line_position, indent)
+        elif opcode in (Opcode.GOTO, Opcode.GOSUB, Opcode.TAIL_CALL):
+            cls._emit_jump(lines, step, index, packed_position, indent)
+        elif opcode == Opcode.RETURN:
+            lines.append(f'{indent}if not call_stack:')
+            lines.append(f'{indent}    raise _runtime_error("RETURN without matching subroutine call", {packed_position})')
+            lines.append(f'{indent}block = call_stack.pop()')
+            lines.append(f'{indent}continue')
+        elif opcode == Opcode.END:
+            lines.append(f'{indent}block = {len(program.instructions)}')
+            lines.append(f'{indent}break')
+        elif opcode == Opcode.FAIL:
+            message, = step.operands
+            lines.append(f'{indent}raise _runtime_error({message!r}, {packed_position})')
+    @classmethod
+    def _emit_arithmetic(cls, lines: List[str], program: CompiledProgram, step: Instruction, packed_position: int, packed_line_position: int, indent: str):
+        slot, operand_slot, literal = step.operands
+        target = f'v{slot}'
+        operator_text = cls._ARITHMETIC_OPERATORS[step.opcode]
+        if operand_slot is not None:
+            operand = f'v{operand_slot}'
+            fast_path = f'type({target}) is int and type({operand}) is int'
+            if step.opcode == Opcode.DIV:
+                fast_path += f' and {operand}'
+        else:
+            operand = cls._literal(literal)
+            fast_path = f'type({target}) is {type(literal).__name__}'
+            if type(literal) is not int:
+                fast_path = None if step.opcode != Opcode.ADD or type(literal) is not str else fast_path
+            elif step.opcode == Opcode.DIV and literal == 0:
+                fast_path = None
+        generic = f'{target} = _arithmetic({int(step.opcode)}, {target}, {operand}, {program.variable_names[slot]!r}, {packed_position}, {packed_line_position})'
+        if fast_path is None:
+            lines.append(f'{indent}{generic}')
+            return
+        lines.append(f'{indent}if {fast_path}:')
+        lines.append(f'{indent}    {target} = {target} {operator_text} {operand}')
+        lines.append(f'{indent}else:')
+        lines.append(f'{indent}    {generic}')
+    @classmethod
+    def _emit_jump(cls, lines: List[str], step: Instruction, index: int, packed_position: int, indent: str):
+        target, condition = step.operands
+        body_indent = indent
+        if condition is not None:
+            left_slot, left_literal, operator_text, right_slot, right_literal = condition
+            if (left_slot is None and left_literal is None) or (right_slot is None and right_literal is None):
+                lines.append(f'{indent}raise _runtime_error("Undefined variable in condition", {packed_position})')
+                return
+            undefined_checks = [f'v{slot} is None' for slot in (left_slot, right_slot) if slot is not None]
+            if undefined_checks:
+                lines.append(f'{indent}if {" or ".join(undefined_checks)}:')
+                lines.append(f'{indent}    raise _runtime_error("Undefined variable in condition", {packed_position})')
+            comparison = cls._COMPARISON_OPERATORS.get(operator_text)
+            if comparison is None:
+                message = f"Unknown comparison operator '{operator_text}'"
+                lines.append(f'{indent}raise _runtime_error({message!r}, {packed_position})')
+                return
+            left = cls._literal(left_literal) if left_slot is None else f'v{left_slot}'
+            right = cls._literal(right_literal) if right_slot is None else f'v{right_slot}'
+            lines.append(f'{indent}try:')
+            lines.append(f'{indent}    taken = {left} {comparison} {right}')
+            lines.append(f'{indent}except TypeError:')
+            lines.append(f'{indent}    taken = _compare({operator_text!r}, {left}, {right}, {packed_position})')
+            lines.append(f'{indent}if taken:')
+            body_indent = indent + '    '
+        if target is None:
+            lines.append(f'{body_indent}raise _runtime_error("Jump target not specified", {packed_position})')
+            return
+        if step.opcode == Opcode.GOSUB:
+            lines.append(f'{body_indent}call_stack.append({index + 1})')
+        elif step.opcode == Opcode.TAIL_CALL:
+            lines.append(f'{body_indent}if not call_stack:')
+            lines.append(f'{body_indent}    call_stack.append({index + 1})')
+        lines.append(f'{body_indent}block = {target}')
+        lines.append(f'{body_indent}continue')
+    @classmethod
+    def _literal(cls, value: Any) -> str:
+        if type(value) is float and not math.isfinite(value):
+            return f'float({str(value)!r})'
+        return repr(value)
+
+def compile_transpiled(program: CompiledProgram) -> CodeType:
+    return compile(Transpiler.transpile(program), '<smile>', 'exec')
+
+def load_transpiled(code: CodeType) -> Callable:
+    namespace = dict(_RUNTIME_NAMESPACE)
+    exec(code, namespace)
+    return namespace['run_program']
+
+class TranspiledInterpreter:
+    def __init__(self, program: CompiledProgram, input_source: Optional[InputProvider] = None, output: Optional[OutputSink] = None, code: Optional[CodeType] = None):
+        self.program = program
+        self.input_source = input_source if input_source is not None else ConsoleInput()
+        self.output = output if output is not None else StdoutSink()
+        self.state = ProgramState(program, self.input_source, self.output)
+        self._run_program = load_transpiled(code if code is not None else compile_transpiled(program))
+
+    def run(self) -> int:
+        try:
+            self._run_program(self.state)
+        finally:
+            self.output.flush()
+        return 0
+
+    def variables(self) -> Dict[str, Any]:
+        return self.state.variables()
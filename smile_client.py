@@ -0,0 +1,89 @@
+import argparse
+import json
+import socket
+import sys
+
+
+def send_request(socket_path, payload):
+    """Send one JSON request to the daemon and return its JSON reply"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(payload).encode() + b'\n')
+        with connection.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError('Daemon closed the connection')
+    return json.loads(line)
+
+
+def read_program_and_input(program_path=None, input_path=None):
+    """Split standard input into program text (up to the '.' line) and program input, like the interpreter does"""
+    stdin_lines = None
+    if program_path is None:
+        stdin_lines = sys.stdin.read().split('\n')
+        end = next((index for index, line in enumerate(stdin_lines) if line.strip() == '.'), len(stdin_lines) - 1)
+        source, stdin_lines = '\n'.join(stdin_lines[:end + 1]), stdin_lines[end + 1:]
+    else:
+        with open(program_path) as program_file:
+            source = program_file.read()
+    if input_path is not None and input_path != '-':
+        with open(input_path) as input_file:
+            input_text = input_file.read()
+    else:
+        input_text = sys.stdin.read() if stdin_lines is None else '\n'.join(stdin_lines)
+    return source, input_text
+
+
+def main(argv=None):
+    """Run a program on a running daemon with the same output and exit status as smile_interpreter.py"""
+    arg_parser = argparse.ArgumentParser(description='Run Smile programs on a daemon started with smile_interpreter.py --serve.')
+    arg_parser.add_argument('--socket', metavar='SOCKET', required=True,
+                            help='Unix socket the daemon listens on')
+    arg_parser.add_argument('--program', metavar='FILE',
+                            help='load the program from a file instead of reading it from standard input')
+    arg_parser.add_argument('--input', metavar='PATH',
+                            help="read program input from a file instead of the rest of standard input")
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='run the peephole optimizer before executing')
+    arg_parser.add_argument('--max-instructions', type=int, metavar='COUNT',
+                            help='stop the program after this many instructions')
+    arg_parser.add_argument('--max-call-depth', type=int, metavar='DEPTH',
+                            help='stop the program when GOSUB nesting exceeds this depth')
+    arg_parser.add_argument('--max-string-length', type=int, metavar='CHARS',
+                            help='stop the program when a string would grow past this length')
+    arg_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                            help='stop the program after this much wall-clock time')
+    arg_parser.add_argument('--stats', action='store_true',
+                            help='print the daemon program cache and per-worker metrics')
+    arg_parser.add_argument('--shutdown', action='store_true',
+                            help='finish running requests and stop the daemon')
+    options = arg_parser.parse_args(argv)
+
+    if options.stats or options.shutdown:
+        response = send_request(options.socket, {'command': 'stats' if options.stats else 'shutdown'})
+        print(json.dumps(response, indent=2))
+        return
+
+    source, input_text = read_program_and_input(options.program, options.input)
+    response = send_request(options.socket, {
+        'command': 'run',
+        'source': source,
+        'input': input_text,
+        'optimize': options.optimize,
+        'max_instructions': options.max_instructions,
+        'max_call_depth': options.max_call_depth,
+        'max_string_length': options.max_string_length,
+        'deadline_seconds': options.deadline
+    })
+    if response['status'] != 'ok':
+        print(response['error'], file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(response['stdout'])
+    if response['error'] is not None:
+        print(response['error'], file=sys.stderr)
+    if response['exit_status']:
+        sys.exit(response['exit_status'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,92 +1,222 @@
+import argparse
+import sys
 import smile
 
 
 def collect_program_lines():
-    """Gather program lines from user input until termination marker"""
-    program_lines = []
-    label_mappings = {}
-    current_line_num = 1
-    
-    while True:
-        user_input = input().strip()
-        if user_input == '.':
-            break
-            
-        # Handle label definitions
-        if ':' in user_input:
-            label_part, code_part = user_input.split(':', 1)
-            label_name = label_part.strip()
-            label_mappings[label_name] = current_line_num
-            user_input = code_part.strip()
-            
-        program_lines.append(user_input)
-        current_line_num += 1
-    
-    # Update global label registry
-    smile.ProgramState.label_registry.update(label_mappings)
-    return program_lines
+    """Gather program lines and label positions from user input until termination marker"""
+    return smile.split_program_lines(iter(input, None))
+
 
+def open_input(input_path):
+    """Pre-read program input from a file, or from standard input for '-'"""
+    if input_path is None:
+        return smile.ConsoleInput()
+    if input_path == '-':
+        return smile.BufferedInput.from_stream(sys.stdin)
+    return smile.BufferedInput.from_file(input_path)
 
-def execute_program():
+
+def execute_program(output_buffer=None, program_path=None, use_mmap=False, input_path=None, program_cache=None, transpile=False,
+                    optimize=False, report_optimizations=False, profile_stacks=None,
+                    trace=False, memoize_size=None, memoize_stats=False, limits=None, load_workers=None,
+                    snapshot_path=None, snapshot_every=None, snapshot_seconds=None, resume_path=None):
     """Main program execution loop"""
-    source_lines = collect_program_lines()
+    if program_path is None:
+        source_lines, label_registry = collect_program_lines()
+    else:
+        source_lines, label_registry = smile.load_program_file(program_path, use_mmap)
     
     try:
-        processed_instructions = list(smile.process_source(source_lines))
-    except smile.SmileParseException as parse_error:
-        print(parse_error)
+        if program_cache is None:
+            if load_workers is None:
+                compiled_program = smile.compile_source(source_lines, label_registry)
+            else:
+                compiled_program = smile.compile_source_parallel(source_lines, label_registry, load_workers)
+            if optimize:
+                smile.optimize_program(compiled_program)
+        else:
+            compiled_program = program_cache.compile(source_lines, label_registry, optimize, load_workers)
+    except (smile.SmileParseException, smile.SmileLinkException) as load_error:
+        print(load_error)
         return
     
-    instruction_pointer = 0
-    subroutine_stack = []
+    if report_optimizations and compiled_program.optimization_report is not None:
+        print(compiled_program.optimization_report.format(), file=sys.stderr)
     
-    while instruction_pointer < len(processed_instructions):
-        current_instruction = processed_instructions[instruction_pointer]
-        
-        for instruction_token in current_instruction:
-            token_type = instruction_token.kind()
-            
-            # Variable assignment operations
-            if token_type == smile.SmileTokenType.ASSIGN:
-                smile.VariableManager.assign_value(current_instruction)
-            elif token_type == smile.SmileTokenType.OUTPUT:
-                smile.OutputManager.display_content(current_instruction)
-            elif token_type == smile.SmileTokenType.TERMINATE:
-                smile.ProgramState.terminate_execution()
-                return
-            
-            # Input operations
-            elif token_type == smile.SmileTokenType.NUMERIC_INPUT:
-                smile.InputProcessor.handle_numeric_input(current_instruction)
-            elif token_type == smile.SmileTokenType.TEXT_INPUT:
-                smile.InputProcessor.handle_text_input(current_instruction)
-            
-            # Arithmetic operations
-            elif token_type == smile.SmileTokenType.ADDITION:
-                smile.ArithmeticEngine.perform_addition(current_instruction)
-            elif token_type == smile.SmileTokenType.SUBTRACTION:
-                smile.ArithmeticEngine.perform_subtraction(current_instruction)
-            elif token_type == smile.SmileTokenType.MULTIPLICATION:
-                smile.ArithmeticEngine.perform_multiplication(current_instruction)
-            elif token_type == smile.SmileTokenType.DIVISION:
-                smile.ArithmeticEngine.perform_division(current_instruction)
-            
-            # Control flow operations
-            elif token_type == smile.SmileTokenType.JUMP:
-                instruction_pointer = smile.FlowController.execute_jump(
-                    current_instruction, processed_instructions, instruction_pointer)
-                break
-            elif token_type == smile.SmileTokenType.SUBROUTINE_CALL:
-                instruction_pointer, subroutine_stack = smile.FlowController.execute_subroutine_call(
-                    current_instruction, processed_instructions, instruction_pointer, subroutine_stack)
-                break
-            elif token_type == smile.SmileTokenType.SUBROUTINE_RETURN:
-                instruction_pointer = smile.FlowController.execute_subroutine_return(subroutine_stack)
-                break
-        
+    profiler = None
+    hooks = None
+    if profile_stacks is not None:
+        profiler = smile.Profiler(compiled_program, source_lines)
+    if trace:
+        hooks = smile.ExecutionTracer(sys.stderr).attach(smile.ExecutionHooks())
+    if profiler is not None or hooks is not None or memoize_size is not None or limits is not None:
+        interpreter = smile.Interpreter(compiled_program, open_input(input_path), smile.StdoutSink(output_buffer))
+    elif transpile:
+        code = smile.compile_transpiled(compiled_program) if program_cache is None else program_cache.transpile(compiled_program)
+        interpreter = smile.TranspiledInterpreter(compiled_program, open_input(input_path), smile.StdoutSink(output_buffer), code)
+    else:
+        interpreter = smile.Interpreter(compiled_program, open_input(input_path), smile.StdoutSink(output_buffer))
+    
+    snapshots = None
+    try:
+        if snapshot_path is not None:
+            snapshots = smile.SnapshotWriter(compiled_program, snapshot_path, snapshot_every, snapshot_seconds)
+            if resume_path is not None:
+                snapshots.resume(interpreter.state, smile.read_snapshot(resume_path))
+        elif resume_path is not None:
+            smile.read_snapshot(resume_path).restore(interpreter.state, smile.program_fingerprint(compiled_program))
+    except (smile.SmileSnapshotException, OSError) as snapshot_error:
+        print(snapshot_error, file=sys.stderr)
+        sys.exit(1)
+    
+    memoizer = None
+    if memoize_size is not None:
+        memoizer = smile.SubroutineMemoizer(compiled_program, memoize_size)
+        memoizer.install(interpreter.state)
+    
+    try:
+        if profiler is None and hooks is None and limits is None and snapshots is None:
+            interpreter.run()
         else:
-            instruction_pointer += 1
+            interpreter.run(profiler, hooks, limits, snapshots)
+    except smile.SmileLimitException as limit_error:
+        print(limit_error)
+        print(smile.format_limit_summary(limit_error.summary()), file=sys.stderr)
+        sys.exit(1)
+    except smile.SmileRuntimeException as runtime_error:
+        print(runtime_error)
+        sys.exit(1)
+    finally:
+        if profiler is not None:
+            print(profiler.format_report(), file=sys.stderr)
+            profiler.write_collapsed_stacks(profile_stacks)
+        if memoizer is not None and memoize_stats:
+            print(memoizer.format_statistics(), file=sys.stderr)
+
+
+def execute_batch(source, results_path, workers):
+    """Run every program in a directory or manifest and write per-program results"""
+    jobs = smile.discover_jobs(source)
+    summary = smile.run_batch(jobs, workers)
+    smile.write_results(summary, results_path)
+    print(f"{summary['programs']} programs, {summary['failed']} failed, "
+          f"{summary['wall_seconds']:.3f}s on {summary['workers']} workers", file=sys.stderr)
+
+
+def execute_lockstep(program_path, input_directory, results_path, optimize=False):
+    """Run one program against every input set in a directory in lockstep and write per-input results"""
+    if program_path is None:
+        source_lines, label_registry = collect_program_lines()
+    else:
+        source_lines, label_registry = smile.load_program_file(program_path)
+    try:
+        compiled_program = smile.compile_source(source_lines, label_registry)
+    except (smile.SmileParseException, smile.SmileLinkException) as load_error:
+        print(load_error)
+        return
+    if optimize:
+        smile.optimize_program(compiled_program)
+    summary = smile.run_lockstep_files(compiled_program, input_directory)
+    smile.write_results(summary, results_path)
+    engine = 'vectorized' if summary['vectorized'] else 'scalar'
+    print(f"{summary['lanes']} input sets, {summary['failed']} failed, {summary['scalar_lanes']} finished on the scalar path, "
+          f"{summary['wall_seconds']:.3f}s ({engine} engine)", file=sys.stderr)
+
+
+def main(argv=None):
+    """Parse command line options and dispatch to the requested mode"""
+    arg_parser = argparse.ArgumentParser(description='Run Smile programs.')
+    arg_parser.add_argument('--batch', metavar='SOURCE',
+                            help='directory of .smile/.in files or a JSON manifest to run in parallel')
+    arg_parser.add_argument('--lockstep', metavar='DIR',
+                            help='run the program once per .in file in DIR, executing numeric programs over all inputs at once')
+    arg_parser.add_argument('--results', metavar='PATH', default='smile_results.json',
+                            help='where batch and lockstep modes write their JSON results')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='batch or daemon worker processes (defaults to the CPU count)')
+    arg_parser.add_argument('--serve', metavar='SOCKET',
+                            help='run a daemon that executes programs sent to this Unix socket in warm worker processes')
+    arg_parser.add_argument('--daemon-programs', type=int, default=smile.DEFAULT_PROGRAM_ENTRIES, metavar='ENTRIES',
+                            help='compiled programs the daemon keeps in memory')
+    arg_parser.add_argument('--output-buffer', type=int, default=None, metavar='BYTES',
+                            help='bytes of PRINT output to buffer before writing (0 writes every line)')
+    arg_parser.add_argument('--program', metavar='FILE',
+                            help='load the program from a file instead of reading it from standard input')
+    arg_parser.add_argument('--mmap', action='store_true',
+                            help='memory-map the --program file instead of reading it')
+    arg_parser.add_argument('--input', metavar='PATH',
+                            help="pre-read program input from a file ('-' reads all of standard input up front)")
+    arg_parser.add_argument('--cache-dir', metavar='DIR',
+                            help='reuse compiled programs stored in this directory, keyed by source hash')
+    arg_parser.add_argument('--cache-size', type=int, default=smile.DEFAULT_CACHE_SIZE, metavar='BYTES',
+                            help='evict least recently used compiled programs beyond this total size')
+    arg_parser.add_argument('--transpile', action='store_true',
+                            help='run the program as generated Python code instead of interpreting it')
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='run the peephole optimizer (constant folding, superinstructions, dead code removal)')
+    arg_parser.add_argument('--optimization-report', action='store_true',
+                            help='with --optimize, list the rewrites that fired on standard error')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='report per-line, per-opcode and per-subroutine timings on standard error')
+    arg_parser.add_argument('--profile-stacks', metavar='PATH', default='smile_profile.folded',
+                            help='where --profile writes collapsed stacks for flamegraph tools')
+    arg_parser.add_argument('--trace', action='store_true',
+                            help='log every executed statement, variable write, jump and call on standard error')
+    arg_parser.add_argument('--memoize', action='store_true',
+                            help='cache the results of GOSUB subroutines that do no I/O and only jump within themselves')
+    arg_parser.add_argument('--memoize-size', type=int, default=smile.DEFAULT_MEMO_SIZE, metavar='ENTRIES',
+                            help='results kept per memoized subroutine, least recently used evicted first')
+    arg_parser.add_argument('--memoize-stats', action='store_true',
+                            help='with --memoize, print per-subroutine hit/miss counts on standard error')
+    arg_parser.add_argument('--max-instructions', type=int, metavar='COUNT',
+                            help='stop the program after this many executed instructions')
+    arg_parser.add_argument('--max-call-depth', type=int, metavar='DEPTH',
+                            help='stop the program when GOSUB nesting exceeds this depth')
+    arg_parser.add_argument('--max-string-length', type=int, metavar='CHARS',
+                            help='stop the program before it builds a longer string value')
+    arg_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                            help='stop the program after this much wall-clock time')
+    arg_parser.add_argument('--load-workers', type=int, metavar='N',
+                            help='lex and validate large programs in N worker processes')
+    arg_parser.add_argument('--snapshot', metavar='PATH',
+                            help='save the execution state here periodically, on SIGUSR1, and on SIGTERM before exiting')
+    arg_parser.add_argument('--snapshot-every', type=int, metavar='COUNT',
+                            help='with --snapshot, save after every COUNT executed instructions')
+    arg_parser.add_argument('--snapshot-seconds', type=float, metavar='SECONDS',
+                            help='with --snapshot, save at most this many seconds apart')
+    arg_parser.add_argument('--resume', metavar='PATH',
+                            help='continue the program from a snapshot taken with --snapshot')
+    options = arg_parser.parse_args(argv)
+    if (options.snapshot or options.resume) and (options.transpile or options.profile or options.trace or options.memoize
+                                                 or options.max_instructions is not None or options.max_call_depth is not None
+                                                 or options.max_string_length is not None or options.deadline is not None):
+        arg_parser.error('--snapshot and --resume cannot be combined with --transpile, --profile, --trace, --memoize or limits')
+    if (options.profile or options.trace) and (options.max_instructions is not None or options.max_call_depth is not None
+                                               or options.max_string_length is not None or options.deadline is not None):
+        arg_parser.error('--profile and --trace cannot be combined with --max-instructions, --max-call-depth, --max-string-length or --deadline')
+    if (options.snapshot_every is not None or options.snapshot_seconds is not None) and not options.snapshot:
+        arg_parser.error('--snapshot-every and --snapshot-seconds need --snapshot')
+    
+    if options.batch:
+        execute_batch(options.batch, options.results, options.workers)
+    elif options.serve:
+        try:
+            smile.serve_daemon(options.serve, options.workers, options.daemon_programs)
+        except FileExistsError as socket_error:
+            print(socket_error, file=sys.stderr)
+            sys.exit(1)
+    elif options.lockstep:
+        execute_lockstep(options.program, options.lockstep, options.results, options.optimize)
+    else:
+        limits = smile.ExecutionLimits(options.max_instructions, options.max_call_depth, options.max_string_length, options.deadline)
+        program_cache = smile.ProgramCache(options.cache_dir, options.cache_size) if options.cache_dir else None
+        execute_program(options.output_buffer, options.program, options.mmap, options.input, program_cache, options.transpile,
+                        options.optimize, options.optimization_report, options.profile_stacks if options.profile else None,
+                        options.trace, options.memoize_size if options.memoize else None, options.memoize_stats,
+                        limits if limits.active() else None, options.load_workers,
+                        options.snapshot, options.snapshot_every, options.snapshot_seconds, options.resume)
 
 
 if __name__ == '__main__':
-    execute_program() 
\ No newline at end of file
+    main()